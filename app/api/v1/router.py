@@ -1,12 +1,20 @@
 # project-rag-kaiser/app/api/v1/router.py
 import logging
 from fastapi import APIRouter, HTTPException, Request
-from app.api.v1.schemas import QueryRequest, QueryResponse, HealthResponse
+from fastapi.responses import JSONResponse
+from app.api.v1.schemas import QueryRequest, QueryResponse, HealthResponse, ReadinessResponse
+from app.api.v1.serialization import FastJSONResponse, project_result
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/v1", tags=["Rag"])
 
 
+def _startup_phase(request: Request) -> str:
+    startup = getattr(request.app.state, "startup", None)
+    return startup.phase if startup is not None else "unknown"
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check(request: Request):
     """Check API health and RAG pipeline status."""
@@ -14,29 +22,86 @@ async def health_check(request: Request):
     status = "healthy" if rag_pipeline else "degraded"
     return HealthResponse(
         status=status,
-        message="RAG API is running" if rag_pipeline else "RAG Pipeline not initialized"
+        message="RAG API is running" if rag_pipeline
+        else f"RAG Pipeline not initialized (phase: {_startup_phase(request)})"
     )
 
 
-@router.post("/query", response_model=QueryResponse)
+@router.get("/health/live", response_model=HealthResponse)
+async def liveness():
+    """Liveness probe: the process is up and serving the event loop."""
+    return HealthResponse(status="alive", message="RAG API process is running")
+
+
+@router.get("/health/ready", response_model=ReadinessResponse,
+            responses={503: {"model": ReadinessResponse}})
+async def readiness(request: Request):
+    """
+    Readiness probe: 200 once the pipeline is loaded and warmed up, 503 while
+    booting ("import"/"load"/"warmup"/"replay") or after a failed startup ("failed").
+    While replaying logged questions, ``detail`` holds replay_done/replay_total.
+    """
+    startup = getattr(request.app.state, "startup", None)
+    rag_pipeline = getattr(request.app.state, "rag_pipeline", None)
+    info = startup.as_dict() if startup is not None else {"phase": "unknown"}
+    ready = rag_pipeline is not None and (startup is None or startup.is_ready)
+    body = ReadinessResponse(status="ready" if ready else "not_ready", **info)
+    return JSONResponse(status_code=200 if ready else 503, content=body.model_dump())
+
+
+PROFILE_HEADER = "X-Profile"
+
+
+def _profile_requested(request: Request) -> bool:
+    """True when the caller forces profiling via header or ?profile=1 and PROFILE_ALLOW_FORCE is set."""
+    if not settings.PROFILE_ALLOW_FORCE:
+        return False
+    value = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile")
+    return bool(value) and value.lower() in ("1", "true", "yes", "on")
+
+
+# The body is built by project_result and returned directly (no response_model
+# validation); QueryResponse only documents it in the OpenAPI schema
+@router.post("/query", response_model=None,
+             responses={200: {"model": QueryResponse, "description": "Fields present depend on response_mode"}})
 async def query(request: Request, payload: QueryRequest):
     """
     Query the RAG system with a question.
 
     The RAG pipeline instance is retrieved from app.state (set during startup).
+    ``response_mode`` selects "answer", "citations" or "full" (default) output.
+    With PROFILE_ALLOW_FORCE set, send ``X-Profile: 1`` (or ``?profile=1``) to
+    capture a cProfile for this request; the written file is returned in the
+    ``X-Profile-Path`` header.
     """
     rag_pipeline = getattr(request.app.state, "rag_pipeline", None)
     if not rag_pipeline:
-        logger.error("Query attempted but RAG Pipeline not initialized")
-        raise HTTPException(status_code=503, detail="RAG Pipeline not initialized")
+        phase = _startup_phase(request)
+        logger.error("Query attempted but RAG Pipeline not initialized (phase: %s)", phase)
+        raise HTTPException(
+            status_code=503,
+            detail=f"RAG Pipeline not initialized (phase: {phase})",
+            headers={"Retry-After": "5"} if phase != "failed" else None,
+        )
 
     if not payload.question or len(payload.question.strip()) == 0:
         raise HTTPException(status_code=400, detail="Question cannot be empty")
 
     try:
-        result = rag_pipeline.query(payload.question, top_k=payload.top_k if getattr(payload, "top_k", None) else None)
-        # If pipeline.query returns keys matching the QueryResponse schema, this will validate and return it.
-        return QueryResponse(**result)
+        result = rag_pipeline.query(
+            payload.question,
+            top_k=payload.top_k if getattr(payload, "top_k", None) else None,
+            profile=_profile_requested(request),
+            filters=payload.filters,
+        )
+        profile_path = result.pop("profile", None)
+        query_log = getattr(request.app.state, "query_log", None)
+        if query_log is not None and not result.get("error"):
+            query_log.record(payload.question)
+        # Serialized directly (orjson) rather than through QueryResponse validation
+        body = project_result(result, payload.response_mode, payload.include_timings)
+        headers = {"X-Profile-Path": profile_path} if profile_path else None
+        return FastJSONResponse(body, headers=headers)
     except Exception:
         logger.exception("Error processing query")
         raise HTTPException(status_code=500, detail="Error processing your query")
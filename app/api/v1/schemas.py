@@ -1,12 +1,48 @@
 """API request/response schemas."""
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from app.schemas.ingestion import FILTERABLE_FIELDS
+
+FilterValue = Union[int, str, List[Union[int, str]]]
 
 
 class QueryRequest(BaseModel):
     """Request body for RAG queries."""
     question: str
     top_k: int = 5  
+    include_timings: bool = False
+    # "answer": answer only; "citations": answer + source_file/page/chapter;
+    # "full": answer + citations + chunk texts and scores
+    response_mode: Literal["answer", "citations", "full"] = "full"
+    # Metadata filters, e.g. {"region": "WA", "chapter": ["3", "4"]}; a list
+    # matches any of its values, several fields must all match
+    filters: Optional[Dict[str, FilterValue]] = None
+
+    @field_validator("filters")
+    @classmethod
+    def _known_fields(cls, value):
+        unknown = sorted(set(value or {}) - set(FILTERABLE_FIELDS))
+        if unknown:
+            raise ValueError(f"Unknown filter field(s) {unknown}; allowed: {list(FILTERABLE_FIELDS)}")
+        if value is None:
+            return value
+        # Coerce to the stored types (page is an int, everything else a string)
+        # so a bad value is a 422 here rather than an empty result later
+        coerced = {}
+        for field, raw in value.items():
+            items = raw if isinstance(raw, list) else [raw]
+            if field == "page":
+                pages = []
+                for item in items:
+                    if isinstance(item, str) and not item.strip().isdigit():
+                        raise ValueError(f"Filter 'page' must be an integer, got {item!r}")
+                    pages.append(int(item))
+                items = pages
+            else:
+                items = [str(item) for item in items]
+            coerced[field] = items if isinstance(raw, list) else items[0]
+        return coerced
 
 
 class RetrievalResult(BaseModel):
@@ -15,17 +51,46 @@ class RetrievalResult(BaseModel):
     score: float
 
 
+class Citation(BaseModel):
+    """Source reference for one retrieved chunk."""
+    source_file: Optional[str] = None
+    page: Optional[int] = None
+    chapter: Optional[str] = None
+    score: float
+
+
 class QueryResponse(BaseModel):
-    """Response from RAG query."""
+    """
+    Response from RAG query, as built by serialization.project_result.
+
+    question, answer, num_chunks and error are always present; citations is
+    added in "citations" and "full" mode, context and scores in "full" mode,
+    timings only with include_timings. Absent fields are omitted, not null.
+    """
     question: str
     answer: str
-    context: List[str]
-    scores: List[float] = []
+    context: Optional[List[str]] = None
+    scores: Optional[List[float]] = None
+    citations: Optional[List[Citation]] = None
     num_chunks: int
-    error: Optional[bool] = False
+    error: bool = False
+    # Confidence band: "full", "cheap" (smaller generator), "abstain" (no LLM
+    # call, nearest sources only), "none" (nothing retrieved) or "error"
+    band: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
 
 
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str
     message: str
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness probe response with startup phase details."""
+    status: str
+    phase: str
+    phases_ms: Dict[str, float] = {}
+    uptime_s: float = 0.0
+    error: Optional[str] = None
+    detail: Dict[str, Any] = {}
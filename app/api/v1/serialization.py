@@ -0,0 +1,73 @@
+"""Response projection and fast JSON encoding for /v1/query."""
+import json
+from typing import List
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+RESPONSE_MODES = ("answer", "citations", "full")
+
+
+def _citations(result: dict) -> List[dict]:
+    citations = []
+    for meta, score in zip(result.get("metadata") or [], result.get("scores") or []):
+        meta = meta or {}
+        citations.append({
+            "source_file": meta.get("source_file") or None,
+            # Page 0 is a real page; only a missing one is None
+            "page": meta.get("page"),
+            "chapter": meta.get("chapter") or None,
+            "score": score,
+        })
+    return citations
+
+
+def project_result(result: dict, mode: str = "full", include_timings: bool = False) -> dict:
+    """
+    Reduce a RAGPipeline.query result to the fields a client asked for.
+
+    - "answer": question, answer, num_chunks
+    - "citations": adds source_file/page/chapter/score per chunk
+    - "full": adds the chunk texts and scores as well
+    """
+    body = {
+        "question": result.get("question"),
+        "answer": result.get("answer"),
+        "num_chunks": result.get("num_chunks", 0),
+        "error": bool(result.get("error", False)),
+    }
+    if result.get("band"):
+        body["band"] = result["band"]
+    if mode in ("citations", "full"):
+        body["citations"] = _citations(result)
+    if mode == "full":
+        body["context"] = result.get("context") or []
+        body["scores"] = result.get("scores") or []
+    if include_timings and result.get("timings") is not None:
+        body["timings"] = result["timings"]
+    return body
+
+
+def _default(value):
+    # numpy scalars (e.g. float32 scores) expose .item()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Encode with orjson when installed, stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (falls back to stdlib json)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,12 +1,97 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
+from typing import Optional
 
 
 class Settings(BaseSettings):
-    OPENAI_API_KEY: str
+    # Only required when LLM_BACKEND=openai
+    OPENAI_API_KEY: str = ""
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     CHUNK_SIZE: int = 800
     CHUNK_OVERLAP: int = 100
+    # Fraction of queries/ingestions to profile (0 disables sampling)
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_DIR: str = "data/profiles"
+    # Honour X-Profile / ?profile=1 from clients; leave off on public deployments
+    PROFILE_ALLOW_FORCE: bool = False
+    # Generator backend: "openai" or "fake" (offline, deterministic stand-in)
+    LLM_BACKEND: str = "openai"
+    FAKE_LLM_LATENCY_MS: float = 800.0
+    FAKE_LLM_LATENCY_SIGMA: float = 0.3
+    FAKE_LLM_TOKENS_PER_SEC: float = 50.0
+    FAKE_LLM_FAILURE_RATE: float = 0.0
+    FAKE_LLM_SEED: Optional[int] = None
+    # Retriever candidate depth: min(top_k * multiplier, max) candidates are rescored
+    RETRIEVAL_CANDIDATE_MULTIPLIER: int = 2
+    RETRIEVAL_MAX_CANDIDATES: int = 50
+    # Logging: LOG_ASYNC moves handler I/O to a background thread; LOG_FORMAT is
+    # "text" or "json"; LOG_LEVELS / LOG_SAMPLING take "logger=value,..." lists
+    LOG_ASYNC: bool = True
+    LOG_FORMAT: str = "text"
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str = "kaiser_rag.log"
+    LOG_FILE_LEVEL: str = "DEBUG"
+    LOG_LEVELS: str = ""
+    LOG_SAMPLING: str = ""
+    # Blue/green index snapshots: rebuilds go to INDEX_SNAPSHOT_ROOT/<version>/
+    INDEX_SNAPSHOT_ROOT: str = "data/embeddings/snapshots"
+    INDEX_RELOAD_INTERVAL_S: float = 5.0
+    INDEX_SNAPSHOTS_KEEP: int = 2
+    # Responses larger than this are gzip-compressed for clients that accept it
+    GZIP_MIN_BYTES: int = 1024
+    # int8 candidate index (rag.quantized_index): scan compressed codes, re-rank
+    # QUANTIZED_OVERFETCH x the candidate depth with full-precision vectors
+    QUANTIZED_INDEX: bool = False
+    QUANTIZED_OVERFETCH: int = 4
+    # Keep chunk text in <persist_dir>/texts.bin (app.ingestion.text_store)
+    # instead of Chroma documents; records are zlib-compressed when it helps
+    TEXT_STORE: bool = True
+    TEXT_STORE_COMPRESS: bool = True
+    # Confidence gating on the best hybrid retrieval score (0.7 * (1 - L2 distance)
+    # + 0.3 * metadata bonus): below ABSTAIN_SCORE_THRESHOLD no LLM call is made,
+    # below CHEAP_SCORE_THRESHOLD the cheaper generator gets CHEAP_CONTEXT_CHUNKS
+    # chunks. None disables a band.
+    ABSTAIN_SCORE_THRESHOLD: Optional[float] = None
+    CHEAP_SCORE_THRESHOLD: Optional[float] = None
+    CHEAP_LLM_MODEL: str = "gpt-4o-mini"
+    CHEAP_CONTEXT_CHUNKS: int = 3
+    # Cross-encoder re-ranking (rag.reranker) of the top RERANK_MAX_CANDIDATES
+    # chunks; falls back to hybrid-score order past RERANK_BUDGET_MS
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_MAX_CANDIDATES: int = 20
+    RERANK_BUDGET_MS: float = 150.0
+    RERANK_MAX_LENGTH: int = 256
+    RERANK_WORKERS: int = 2
+    # Spread chunks over CHROMA_SHARDS collections (<collection>_shardNN) in the
+    # persist dir, queried in parallel by rag.sharded_retriever. SHARD_KEY is
+    # "source_file" (a document's chunks share a shard) or "chunk" (by chunk id)
+    CHROMA_SHARDS: int = 1
+    SHARD_KEY: str = "source_file"
+    SHARD_QUERY_WORKERS: int = 8
+    # Opt-in log of normalized, best-effort scrubbed questions (app.core.query_log);
+    # it can still hold names, addresses or conditions. At startup the
+    # QUERY_LOG_WARMUP_TOP most frequent (asked at least QUERY_LOG_MIN_COUNT
+    # times) are replayed through embed + retrieve for up to
+    # QUERY_LOG_WARMUP_BUDGET_S seconds before the instance reports ready
+    QUERY_LOG_ENABLED: bool = False
+    QUERY_LOG_PATH: str = "data/query_log.jsonl"
+    QUERY_LOG_FLUSH_EVERY: int = 50
+    QUERY_LOG_MAX_ENTRIES: int = 5000
+    QUERY_LOG_MIN_COUNT: int = 2
+    QUERY_LOG_WARMUP_TOP: int = 200
+    QUERY_LOG_WARMUP_BUDGET_S: float = 30.0
+    # LRU cache of query embeddings keyed by normalized question; 0 disables it
+    QUERY_EMBED_CACHE_SIZE: int = 1024
+    # Ingestion write-behind (app.ingestion.bulk_writer): chunks are embedded and
+    # written INGEST_BATCH_SIZE at a time (capped at Chroma's max batch size),
+    # with up to INGEST_WRITE_QUEUE batches waiting for the writer thread.
+    # Transient write failures are retried INGEST_WRITE_RETRIES times with
+    # exponential backoff from INGEST_WRITE_BACKOFF_S
+    INGEST_BATCH_SIZE: int = 512
+    INGEST_WRITE_QUEUE: int = 4
+    INGEST_WRITE_RETRIES: int = 3
+    INGEST_WRITE_BACKOFF_S: float = 0.5
     model_config = ConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
@@ -1,10 +1,148 @@
-"""Logging configuration."""
+"""Logging configuration.
+
+By default records are handed to a queue on the calling thread and formatted
+and written by a background QueueListener, so file/console I/O stays off the
+request path. Noisy third-party loggers are capped at WARNING, and per-logger
+levels and sampling rates can be tuned with LOG_LEVELS / LOG_SAMPLING.
+"""
+import atexit
+import json
 import logging
 import logging.config
+import logging.handlers
+import os
+import queue
+import random
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+# Set per request by the API middleware; "-" outside a request
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# High-volume libraries that log at DEBUG/INFO on every call
+NOISY_LOGGERS = {
+    "chromadb": "WARNING",
+    "httpx": "WARNING",
+    "httpcore": "WARNING",
+    "urllib3": "WARNING",
+    "openai": "WARNING",
+    "sentence_transformers": "WARNING",
+    "transformers": "WARNING",
+    "posthog": "WARNING",
+}
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def _parse_mapping(raw: str) -> Dict[str, str]:
+    """Parse "name=value,name2=value2" into a dict."""
+    out = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            out[name.strip()] = value.strip()
+    return out
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp each record with the current request ID."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Already stamped on the emitting thread when logging through the queue
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of below-WARNING records per logger.
+
+    Rates are matched on the longest logger-name prefix, e.g.
+    {"rag.retriever": 0.1} keeps 10% of retriever INFO/DEBUG lines.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, best = 1.0, -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields (e.g. timings) are included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def _start_queue(handlers, filters):
+    """Route root logging through a queue drained by a background listener."""
+    global _listener, _queue_handler
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    for f in filters:
+        _queue_handler.addFilter(f)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    logging.getLogger().addHandler(_queue_handler)
+
+
+def _stop_queue():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_queue_after_fork():
+    # The listener thread does not survive fork; give the child its own
+    global _listener
+    if _queue_handler is None or _listener is None:
+        return
+    handlers = _listener.handlers
+    filters = list(_queue_handler.filters)
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _start_queue(handlers, filters)
 
 
 def setup_logging():
     """Configure logging for the application."""
+    fmt = "json" if settings.LOG_FORMAT.lower() == "json" else None
     logging_config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -13,31 +151,70 @@ def setup_logging():
                 "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
             },
             "detailed": {
-                "format": "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
+                "format": "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - [%(request_id)s] - %(message)s"
+            },
+            "json": {
+                "()": JsonFormatter
+            }
+        },
+        "filters": {
+            "request_context": {
+                "()": RequestContextFilter
             }
         },
         "handlers": {
             "console": {
                 "class": "logging.StreamHandler",
-                "level": "INFO",
-                "formatter": "standard",
+                "level": settings.LOG_LEVEL.upper(),
+                "formatter": fmt or "standard",
+                "filters": ["request_context"],
                 "stream": "ext://sys.stdout"
             },
             "file": {
                 "class": "logging.FileHandler",
-                "level": "DEBUG",
-                "formatter": "detailed",
-                "filename": "kaiser_rag.log",
+                "level": settings.LOG_FILE_LEVEL.upper(),
+                "formatter": fmt or "detailed",
+                "filters": ["request_context"],
+                "filename": settings.LOG_FILE,
                 "encoding": "utf-8"
             }
         },
         "loggers": {
             "": {
-                "level": "DEBUG",
+                # No lower than the most verbose handler, so dropped records are never built
+                "level": min(logging.getLevelName(settings.LOG_LEVEL.upper()),
+                             logging.getLevelName(settings.LOG_FILE_LEVEL.upper())),
                 "handlers": ["console", "file"],
                 "propagate": True
             }
         }
     }
-    
+
+    levels = dict(NOISY_LOGGERS)
+    levels.update({name: level.upper() for name, level in _parse_mapping(settings.LOG_LEVELS).items()})
+    for name, level in levels.items():
+        logging_config["loggers"][name] = {"level": level}
+
+    _stop_queue()
     logging.config.dictConfig(logging_config)
+
+    root = logging.getLogger()
+    filters = [RequestContextFilter()]
+    rates = {name: float(rate) for name, rate in _parse_mapping(settings.LOG_SAMPLING).items()}
+    if rates:
+        filters.append(SamplingFilter(rates))
+
+    if settings.LOG_ASYNC:
+        handlers = list(root.handlers)
+        for handler in handlers:
+            root.removeHandler(handler)
+        _start_queue(handlers, filters)
+    else:
+        for handler in root.handlers:
+            for f in filters[1:]:
+                handler.addFilter(f)
+
+
+atexit.register(_stop_queue)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_queue_after_fork)
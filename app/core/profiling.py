@@ -0,0 +1,76 @@
+"""Opt-in cProfile hooks for queries and ingestion.
+
+Profiles are written as pstats files (open with ``python -m pstats <file>``
+or snakeviz). When profiling is off the only cost is one comparison per call.
+"""
+import cProfile
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# cProfile hooks the calling thread only; one active profile at a time keeps
+# concurrent requests from clobbering each other's output.
+_active = threading.Lock()
+_seq = itertools.count(1)
+
+
+class ProfileSession:
+    """Handle for an in-flight profile; ``path`` is set once it is written."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path: Optional[Path] = None
+
+
+def should_profile(force: bool = False) -> bool:
+    """Decide whether to profile this call (forced, or sampled by PROFILE_SAMPLE_RATE)."""
+    if force:
+        return True
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+@contextmanager
+def profile(name: str, enabled: bool, out_dir: Optional[str] = None):
+    """
+    Profile the enclosed block with cProfile when ``enabled``.
+
+    Yields a ProfileSession, or None when not profiling (disabled, or another
+    profile is already running).
+    """
+    if not enabled or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    session = ProfileSession(name)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield session
+    finally:
+        profiler.disable()
+        _active.release()
+        session.path = _dump(profiler, name, out_dir or settings.PROFILE_DIR)
+
+
+def _dump(profiler: cProfile.Profile, name: str, out_dir: str) -> Optional[Path]:
+    try:
+        directory = Path(out_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}-{int(time.time() * 1000)}-{os.getpid()}-{next(_seq)}.prof"
+        profiler.dump_stats(str(path))
+        logger.info("Wrote %s profile to %s", name, path)
+        return path
+    except Exception:
+        logger.exception("Failed to write %s profile", name)
+        return None
@@ -0,0 +1,158 @@
+# project-rag-kaiser/app/core/query_log.py
+"""
+Log of normalized questions, used to pre-warm new instances (opt-in).
+
+Questions are normalized (lower-cased, whitespace collapsed) and scrubbed
+before they are counted: e-mail addresses, SSNs, phone numbers, dates and
+tokens with 5+ digits (member, claim and record numbers) become placeholders,
+and questions longer than MAX_QUESTION_CHARS are not logged at all. Only the
+scrubbed text and a count are kept; no client, time or answer. The scrub is
+best-effort pattern matching, not anonymization: names, addresses and
+conditions written in free text are kept as asked.
+
+Counts are buffered in memory and appended to QUERY_LOG_PATH as
+``{"q": ..., "n": ...}`` lines every QUERY_LOG_FLUSH_EVERY questions and at
+shutdown. Reading sums the lines; the file is rewritten with the
+QUERY_LOG_MAX_ENTRIES most frequent questions once it holds many more lines.
+Pre-forked workers share the file: appends and the read-and-rewrite of a
+compaction hold an exclusive flock on ``<path>.lock``, so no worker's lines
+are lost to another's compaction (on platforms without fcntl the log is
+meant for a single process).
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAX_QUESTION_CHARS = 300
+
+# Applied in order; earlier patterns must not be broken up by later ones
+_SCRUB = [
+    (re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+"), "<email>"),
+    (re.compile(r"\b\d{3}-\d{2}-\d{4}\b"), "<ssn>"),
+    (re.compile(r"(\+?1[\s.-]?)?\(?\b\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b"), "<phone>"),
+    (re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"), "<date>"),
+    (re.compile(r"\b\w*\d{5,}\w*\b"), "<number>"),
+]
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case and collapse whitespace (the embedding model is uncased)."""
+    return " ".join(question.lower().split())
+
+
+def anonymize(text: str) -> str:
+    for pattern, placeholder in _SCRUB:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+class QueryLog:
+    def __init__(self, path: Optional[str] = None, flush_every: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        self.path = Path(path or settings.QUERY_LOG_PATH)
+        self.flush_every = flush_every or settings.QUERY_LOG_FLUSH_EVERY
+        self.max_entries = max_entries or settings.QUERY_LOG_MAX_ENTRIES
+        self._pending: Counter = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+
+    def record(self, question: str) -> None:
+        """Count one question (scrubbed); flushes every ``flush_every`` questions."""
+        question = normalize_question(question)
+        if not question or len(question) > MAX_QUESTION_CHARS:
+            return
+        with self._lock:
+            self._pending[anonymize(question)] += 1
+            self._pending_total += 1
+            due = self._pending_total >= self.flush_every
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending, self._pending_total = self._pending, Counter(), 0
+        if not pending:
+            return
+        lines = "".join(json.dumps({"q": q, "n": n}) + "\n" for q, n in pending.items())
+        try:
+            with self._locked():
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    fh.write(lines)
+        except OSError:
+            logger.exception("Failed to write query log %s", self.path)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared by every process using this log (appends and compaction)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self) -> Tuple[Counter, int]:
+        counts, lines = Counter(), 0
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        counts[entry["q"]] += int(entry["n"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # a torn line from a crashed writer
+        except FileNotFoundError:
+            pass
+        return counts, lines
+
+    def counts(self) -> Counter:
+        """Question counts on disk (compacting the file when it has grown)."""
+        counts, lines = self._read()
+        if lines > 2 * self.max_entries:
+            try:
+                with self._locked():
+                    # Re-read under the lock: lines appended since the first read are kept
+                    counts, lines = self._read()
+                    if lines > 2 * self.max_entries:
+                        counts = Counter(dict(counts.most_common(self.max_entries)))
+                        self._rewrite(counts)
+            except OSError:
+                logger.exception("Failed to lock query log %s for compaction", self.path)
+        return counts
+
+    def _rewrite(self, counts: Counter) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                for q, n in counts.most_common():
+                    fh.write(json.dumps({"q": q, "n": n}) + "\n")
+            os.replace(tmp, self.path)
+            logger.info("Compacted query log %s to %d questions", self.path, len(counts))
+        except OSError:
+            logger.exception("Failed to compact query log %s", self.path)
+
+    def top(self, n: Optional[int] = None, min_count: Optional[int] = None) -> List[str]:
+        """The ``n`` most frequent questions asked at least ``min_count`` times."""
+        n = settings.QUERY_LOG_WARMUP_TOP if n is None else n
+        min_count = settings.QUERY_LOG_MIN_COUNT if min_count is None else min_count
+        return [q for q, count in self.counts().most_common(n) if count >= min_count]
@@ -0,0 +1,82 @@
+"""Startup phase tracking for liveness/readiness reporting."""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Objects loaded before the server starts (e.g. by the pre-fork parent) that
+# startup should reuse instead of loading again.
+_preloaded: Dict[str, Any] = {}
+
+
+def preload(name: str, obj: Any) -> None:
+    _preloaded[name] = obj
+
+
+def preloaded(name: str) -> Optional[Any]:
+    return _preloaded.get(name)
+
+
+class StartupState:
+    """
+    Tracks the application's boot phases.
+
+    Phases run in order (e.g. "import", "load", "warmup", "replay") and end in either
+    "ready" or "failed". Durations are kept per phase so slow cold starts can
+    be attributed.
+    """
+
+    def __init__(self):
+        self.phase = "starting"
+        self.error: Optional[str] = None
+        self.phase_ms: Dict[str, float] = {}
+        self.detail: Dict[str, object] = {}
+        self._started = time.perf_counter()
+        self._phase_started = self._started
+        self._lock = threading.Lock()
+
+    def begin(self, phase: str) -> None:
+        with self._lock:
+            self._close_phase()
+            self.phase = phase
+            self._phase_started = time.perf_counter()
+        logger.info("Startup phase: %s", phase)
+
+    def update(self, **detail) -> None:
+        """Publish progress of the current phase in the readiness detail."""
+        with self._lock:
+            self.detail.update(detail)
+
+    def ready(self) -> None:
+        with self._lock:
+            self._close_phase()
+            self.phase = "ready"
+            total_ms = (time.perf_counter() - self._started) * 1000.0
+        logger.info("Startup complete in %.0f ms (phases: %s)", total_ms, self.phase_ms)
+
+    def fail(self, error: BaseException) -> None:
+        with self._lock:
+            self._close_phase()
+            self.error = f"{type(error).__name__}: {error}"
+            self.phase = "failed"
+        logger.error("Startup failed after phases %s: %s", self.phase_ms, self.error)
+
+    def _close_phase(self) -> None:
+        if self.phase not in ("starting", "ready", "failed"):
+            self.phase_ms[self.phase] = round((time.perf_counter() - self._phase_started) * 1000.0, 1)
+
+    @property
+    def is_ready(self) -> bool:
+        return self.phase == "ready"
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phase": self.phase,
+                "phases_ms": dict(self.phase_ms),
+                "uptime_s": round(time.perf_counter() - self._started, 1),
+                "error": self.error,
+                "detail": dict(self.detail),
+            }
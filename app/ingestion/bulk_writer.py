@@ -0,0 +1,175 @@
+# project-rag-kaiser/app/ingestion/bulk_writer.py
+"""
+Write-behind bulk writer for the vector store.
+
+The ingestion pipeline embeds chunks one batch at a time and hands each batch
+to ``submit``; a background thread writes it with the store's ``write_batch``
+while the next batch is being embedded. The queue is bounded
+(INGEST_WRITE_QUEUE batches), so a slow store blocks the producer instead of
+piling up embeddings in memory.
+
+Batches are capped at the store's maximum batch size. Transient failures
+(I/O errors, Chroma 5xx/429 errors) are retried with exponential backoff; a
+batch that still fails stops the writer, and the error is raised from the
+next ``submit``, ``flush`` or ``close``, so chunks are never dropped silently.
+``close`` persists once and reports rows/sec.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import INGEST_CHUNKS, INGEST_STAGE_SECONDS, INGEST_WRITE_RETRIES
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL_S = 10.0
+_STOP = object()
+
+
+class BulkWriteError(RuntimeError):
+    """Raised when a batch could not be written to the vector store."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failed write is worth retrying: not for bad input, yes for I/O and server errors."""
+    if isinstance(exc, (ValueError, TypeError, KeyError)):
+        return False
+    code = getattr(exc, "code", None)
+    if callable(code):
+        # chromadb.errors.ChromaError: 4xx means the request itself is wrong
+        try:
+            status = int(code())
+        except Exception:
+            return True
+        return status >= 500 or status == 429
+    return True
+
+
+class BulkWriter:
+    def __init__(self, store, batch_size: Optional[int] = None, queue_size: Optional[int] = None,
+                 retries: Optional[int] = None, backoff_s: Optional[float] = None):
+        self.store = store
+        self.batch_size = max(1, min(batch_size or settings.INGEST_BATCH_SIZE, store.max_batch_size()))
+        self.retries = settings.INGEST_WRITE_RETRIES if retries is None else retries
+        self.backoff_s = settings.INGEST_WRITE_BACKOFF_S if backoff_s is None else backoff_s
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.INGEST_WRITE_QUEUE)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._started: Optional[float] = None
+        self._next_progress = 0.0
+        self.rows = 0
+        self.batches = 0
+        self.retried = 0
+        self.failed_rows = 0
+        self.write_seconds = 0.0
+
+    def __enter__(self) -> "BulkWriter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._started = time.perf_counter()
+                self._next_progress = time.monotonic() + PROGRESS_INTERVAL_S
+                self._thread = threading.Thread(target=self._run, name="bulk-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, ids: List[str], embeddings: List[List[float]], chunks: List[str],
+               metadatas: List[dict]) -> None:
+        """Queue one batch of at most ``batch_size`` rows; blocks while the queue is full."""
+        if len(ids) > self.batch_size:
+            raise ValueError(f"Batch of {len(ids)} rows exceeds the writer's batch size {self.batch_size}")
+        self._raise_if_failed()
+        self.start()
+        self._queue.put((ids, embeddings, chunks, metadatas))
+
+    def flush(self) -> None:
+        """Wait until every queued batch is written."""
+        if self._thread is not None:
+            self._queue.join()
+        self._raise_if_failed()
+
+    def close(self) -> dict:
+        """Write what is queued, persist once and return the write stats."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        if self._error is None and self.rows:
+            self.store.persist()
+        stats = self.stats()
+        logger.info("Wrote %d rows in %d batches in %.1fs (%.0f rows/s; %.0f rows/s in the store; %d retries)",
+                    stats["rows"], stats["batches"], stats["seconds"], stats["rows_per_s"],
+                    stats["write_rows_per_s"], stats["retries"])
+        self._raise_if_failed()
+        return stats
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "retries": self.retried,
+            "failed_rows": self.failed_rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "write_rows_per_s": round(self.rows / self.write_seconds, 1) if self.write_seconds else 0.0,
+        }
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise BulkWriteError(f"Vector store write failed; {self.failed_rows} rows not written") from self._error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._error is not None:
+                    # Keep draining so producers blocked on a full queue wake up and see the error
+                    self.failed_rows += len(item[0])
+                    continue
+                self._write(*item)
+                if time.monotonic() >= self._next_progress:
+                    self._next_progress = time.monotonic() + PROGRESS_INTERVAL_S
+                    logger.info("Bulk writer: %d rows written (%.0f rows/s)", self.rows, self.stats()["rows_per_s"])
+            finally:
+                self._queue.task_done()
+
+    def _write(self, ids, embeddings, chunks, metadatas) -> None:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                self.store.write_batch(ids, embeddings, chunks, metadatas)
+            except Exception as exc:
+                if attempt >= self.retries or not is_transient(exc):
+                    logger.exception("Failed to write a batch of %d rows (attempt %d)", len(ids), attempt + 1)
+                    self.failed_rows += len(ids)
+                    self._error = exc
+                    return
+                attempt += 1
+                self.retried += 1
+                INGEST_WRITE_RETRIES.inc()
+                delay = self.backoff_s * 2 ** (attempt - 1)
+                logger.warning("Batch write failed (%s); retry %d/%d in %.1fs", exc, attempt, self.retries, delay)
+                time.sleep(delay)
+                continue
+            elapsed = time.perf_counter() - start
+            self.write_seconds += elapsed
+            INGEST_STAGE_SECONDS.observe(elapsed, stage="write")
+            self.rows += len(ids)
+            self.batches += 1
+            # Counted here, once stored: duplicates skipped before embedding never reach the writer
+            INGEST_CHUNKS.inc(len(ids))
+            return
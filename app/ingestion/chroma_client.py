@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import hashlib
 import os
 import logging
-import uuid
-from typing import List
+from typing import List, Tuple
+
+from app.core.config import settings
+from app.ingestion.text_store import TextStore
 
 try:
     from chromadb import PersistentClient
@@ -12,12 +15,22 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+# Used when the client cannot report its limit (Chroma's default SQLite limit)
+DEFAULT_MAX_BATCH_SIZE = 5461
+
+
+def chunk_id(text: str, metadata: dict) -> str:
+    """Deterministic id from the chunk's source, page and text, so re-ingestion does not duplicate."""
+    key = f"{metadata.get('source_file', '')}\x00{metadata.get('page', '')}\x00{text}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
 
 class ChromaClient:
     def __init__(self, collection_name: str | None = None, persist_dir: str | None = None):
         self.enabled = False
         self.persist_dir = persist_dir or os.getenv("CHROMA_PERSIST_DIR", "data/embeddings/chroma")
         self.collection_name = collection_name or os.getenv("CHROMA_COLLECTION", "project_rag")
+        self.text_store = TextStore(self.persist_dir) if settings.TEXT_STORE else None
 
         if PersistentClient is None:
             logger.warning("chromadb not installed — Chroma client disabled")
@@ -34,36 +47,100 @@ class ChromaClient:
             logger.exception("Failed to initialize Chroma client; Chroma disabled")
             self.enabled = False
 
-    def insert(self, embeddings: List[List[float]], chunks: List[str], metadatas: List[dict]):
+    def max_batch_size(self) -> int:
+        """Largest number of rows Chroma accepts in one write."""
+        try:
+            return int(self.client.get_max_batch_size())
+        except Exception:
+            return DEFAULT_MAX_BATCH_SIZE
+
+    def new_chunks(self, chunks: List[str], metadatas: List[dict]) -> Tuple[List[str], List[int]]:
+        """
+        Ids and row indexes of the chunks that still need storing: identical
+        chunks within the batch collapse to their first row, and chunks already
+        in the collection (e.g. a re-ingested document) are left as they are.
         """
-        Insert chunks with rich metadata into ChromaDB.
+        first = {}
+        for n, (chunk, meta) in enumerate(zip(chunks, metadatas)):
+            first.setdefault(chunk_id(chunk, meta), n)
+        existing = set()
+        candidates = list(first)
+        step = self.max_batch_size()
+        for i in range(0, len(candidates), step):
+            existing.update(self.collection.get(ids=candidates[i:i + step], include=[])["ids"])
+        ids = [cid for cid in candidates if cid not in existing]
+        return ids, [first[cid] for cid in ids]
+
+    def write_batch(self, ids: List[str], embeddings: List[List[float]], chunks: List[str],
+                    metadatas: List[dict]) -> None:
+        """
+        Upsert one batch (at most ``max_batch_size()`` rows). Raises on failure.
+
+        With the text store, texts are appended first and ``metadatas`` gain
+        their text references in place, so a retried batch does not append its
+        texts twice.
+        """
+        if self.text_store is not None:
+            # Texts go to the blob file; Chroma keeps only vectors and metadata
+            pending = [n for n, meta in enumerate(metadatas) if meta.get("text_offset") is None]
+            if pending:
+                refs = self.text_store.append([chunks[n] for n in pending])
+                for n, ref in zip(pending, refs):
+                    metadatas[n].update(ref)
+            self.collection.upsert(embeddings=embeddings, metadatas=metadatas, ids=ids)
+        else:
+            self.collection.upsert(documents=chunks, embeddings=embeddings, metadatas=metadatas, ids=ids)
+
+    def persist(self) -> None:
+        """Flush to disk on Chroma versions that need it (newer ones persist on write)."""
+        try:
+            self.client.persist()
+        except Exception:
+            pass
+
+    def insert(self, embeddings: List[List[float]], chunks: List[str], metadatas: List[dict]) -> int:
+        """
+        Insert chunks with rich metadata into ChromaDB, in batches of at most
+        ``max_batch_size()`` rows. For large ingestions use
+        app.ingestion.bulk_writer, which also retries and persists once.
         
         Args:
             embeddings: List of embedding vectors
             chunks: List of text chunks
             metadatas: List of metadata dicts for each chunk
+
+        Returns:
+            Number of chunks newly stored (duplicates and already stored chunks are skipped)
         """
         if not self.enabled:
             logger.info("Chroma client disabled — skipping insert of %d chunks", len(chunks))
-            return
+            return 0
 
         if not chunks:
             logger.warning("No chunks to insert into Chroma")
-            return
+            return 0
 
         if len(chunks) != len(metadatas):
             logger.error("Chunks and metadatas length mismatch: %d vs %d", len(chunks), len(metadatas))
-            return
+            return 0
 
+        stored = 0
         try:
-            ids = [str(uuid.uuid4()) for _ in chunks]
-            
-            self.collection.add(documents=chunks, embeddings=embeddings, metadatas=metadatas, ids=ids)
-          
-            try:
-                self.client.persist()
-            except Exception:
-                pass
-            logger.info("Inserted %d chunks into Chroma collection '%s'", len(chunks), self.collection_name)
+            ids, rows = self.new_chunks(chunks, metadatas)
+            if not rows:
+                logger.info("All %d chunks already in Chroma collection '%s'", len(chunks), self.collection_name)
+                return 0
+            step = self.max_batch_size()
+            for i in range(0, len(rows), step):
+                batch = rows[i:i + step]
+                self.write_batch(ids[i:i + step], [embeddings[n] for n in batch], [chunks[n] for n in batch],
+                                 [dict(metadatas[n]) for n in batch])
+                stored += len(batch)
+            self.persist()
+            logger.info("Inserted %d chunks into Chroma collection '%s' (%d duplicates skipped)",
+                        stored, self.collection_name, len(chunks) - stored)
+            return stored
         except Exception:
-            logger.exception("Failed to insert into Chroma collection %s", self.collection_name)
+            logger.exception("Failed to insert into Chroma collection %s after %d chunks", self.collection_name,
+                             stored)
+            return stored
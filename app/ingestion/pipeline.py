@@ -1,38 +1,121 @@
+import logging
+import re
 from pathlib import Path
+from typing import Optional
 from app.ingestion.doc_loader import load_document_from_url
 from app.ingestion.docling_processor import DoclingProcessor
 from app.ingestion.metadata_chunker import MetadataChunker
 from app.ingestion.embedder import Embedder
+from app.ingestion.bulk_writer import BulkWriter
 from app.ingestion.chroma_client import ChromaClient
-from app.schemas.ingestion import IngestionDocument
+from app.ingestion.regions import region_from_filename
+from app.schemas.ingestion import DocumentMetadata, IngestionDocument
+from app.core.metrics import (
+    INGEST_DOCUMENTS,
+    INGEST_PAGES,
+    INGEST_STAGE_SECONDS,
+    StageTimer,
+)
+from app.core.profiling import profile as profile_block, should_profile
+
+logger = logging.getLogger(__name__)
+
+# Document-level fields copied onto every chunk; IngestionDocument.metadata may override them
+DOCUMENT_FIELDS = ("region", "document_type", "version", "title")
 
 
 class IngestionPipeline:
-    def __init__(self):
+    """
+    Load, clean, chunk, embed and store documents.
+
+    Chunks already in the store are skipped before embedding. The rest are
+    embedded a batch at a time and handed to a BulkWriter, which writes one
+    batch while the next is embedded. Pass a shared ``writer`` to persist once
+    for a whole run (the caller then closes it); otherwise each document gets
+    its own writer.
+    """
+
+    def __init__(self, store: ChromaClient = None, writer: Optional[BulkWriter] = None):
         self.chunker = MetadataChunker()
         self.embedder = Embedder()
-        self.store = ChromaClient()
+        self.store = store or ChromaClient()
+        self.writer = writer
+
+    def ingest(self, doc: IngestionDocument, profile: bool = False):
+        with profile_block("ingest", should_profile(profile)) as session:
+            result = self._ingest(doc)
+        if session is not None and session.path is not None:
+            result["profile"] = str(session.path)
+        return result
 
-    def ingest(self, doc: IngestionDocument):
-        page_texts, metadata = load_document_from_url(doc.file_path)
+    def _ingest(self, doc: IngestionDocument):
+        timer = StageTimer(INGEST_STAGE_SECONDS)
+        with timer.stage("load"):
+            page_texts, metadata = load_document_from_url(doc.file_path)
         source_file = Path(doc.file_path).name if doc.file_path else "unknown"
-    
-        cleaned_pages = []
-        for page_num, text in page_texts:
-            cleaned_text = DoclingProcessor.clean_text(text)
-            cleaned_pages.append((page_num, cleaned_text))
-        
+
+        with timer.stage("clean"):
+            cleaned_pages = []
+            for page_num, text in page_texts:
+                cleaned_text = DoclingProcessor.clean_text(text)
+                cleaned_pages.append((page_num, cleaned_text))
+
         # Chunk with metadata
-        chunks_with_metadata = self.chunker.chunk_with_metadata(cleaned_pages, source_file)
-        
+        with timer.stage("chunk"):
+            chunks_with_metadata = self.chunker.chunk_with_metadata(cleaned_pages, source_file)
+
         # Separate chunks and metadata
         chunks = [chunk for chunk, _ in chunks_with_metadata]
         metadatas = [meta for _, meta in chunks_with_metadata]
-        embeddings = self.embedder.embed(chunks)
-        self.store.insert(embeddings, chunks, metadatas)
+        document_fields = self._document_fields(doc, metadata, source_file)
+        for meta in metadatas:
+            meta.update(document_fields)
+        if not self.store.enabled:
+            logger.info("Vector store disabled — skipping %d chunks of %s", len(chunks), source_file)
+            ids, rows = [], []
+        else:
+            with timer.stage("dedupe"):
+                ids, rows = self.store.new_chunks(chunks, metadatas)
+
+        # Embed batch i+1 while the writer thread stores batch i
+        writer = self.writer or BulkWriter(self.store)
+        try:
+            for start in range(0, len(rows), writer.batch_size):
+                batch = rows[start:start + writer.batch_size]
+                batch_chunks = [chunks[n] for n in batch]
+                with timer.stage("embed"):
+                    embeddings = self.embedder.embed(batch_chunks)
+                with timer.stage("store"):
+                    writer.submit(ids[start:start + len(batch)], embeddings, batch_chunks,
+                                  [metadatas[n] for n in batch])
+        finally:
+            if self.writer is None:
+                with timer.stage("store"):
+                    writer.close()
+        stored = len(rows)
+
+        INGEST_DOCUMENTS.inc(status="success")
+        INGEST_PAGES.inc(len(page_texts))
 
         return {
             "chunks": len(chunks),
+            "stored": stored,
             "status": "success",
             "source": doc.source,
+            "timings": timer.as_dict(),
+        }
+
+    @staticmethod
+    def _document_fields(doc: IngestionDocument, metadata: DocumentMetadata, source_file: str) -> dict:
+        """Region, document type, version and title for the document's chunks."""
+        year = re.search(r"(?<!\d)(20\d{2})(?!\d)", source_file)
+        fields = {
+            # Only a region the filename names; DocumentMetadata.region is a schema default, not a fact
+            "region": region_from_filename(source_file),
+            "document_type": metadata.document_type,
+            "version": metadata.version or (year.group(1) if year else None),
+            "title": metadata.title,
         }
+        fields.update({k: v for k, v in (doc.metadata or {}).items() if k in DOCUMENT_FIELDS})
+        # Chroma metadata values cannot be None
+        return {k: v for k, v in fields.items() if v is not None}
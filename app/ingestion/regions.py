@@ -0,0 +1,61 @@
+# project-rag-kaiser/app/ingestion/regions.py
+"""
+Kaiser service-area detection for document filenames and query text.
+
+Regions are stored on every chunk as a short code (e.g. "WA", "CA") so
+retrieval can filter on them.
+"""
+import re
+from typing import Optional
+
+# Full names, matched in filenames and in query text
+REGION_NAMES = {
+    "northern california": "CA",
+    "southern california": "CA",
+    "california": "CA",
+    "washington": "WA",
+    "colorado": "CO",
+    "georgia": "GA",
+    "hawaii": "HI",
+    "oregon": "NW",
+    "northwest": "NW",
+    "mid-atlantic": "MAS",
+    "maryland": "MAS",
+    "virginia": "MAS",
+}
+
+# Abbreviations Kaiser uses in document filenames (e.g. member-guide-wa-en.pdf);
+# too ambiguous to look for in free text
+FILENAME_CODES = {
+    "ca": "CA",
+    "ncal": "CA",
+    "scal": "CA",
+    "wa": "WA",
+    "nw": "NW",
+    "mas": "MAS",
+}
+
+_QUERY_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted((re.escape(n) for n in REGION_NAMES), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def region_from_filename(filename: str) -> Optional[str]:
+    """Region code encoded in a filename, e.g. "...-ncal.pdf" -> "CA"."""
+    stem = filename.rsplit(".", 1)[0].lower()
+    tokens = [t for t in re.split(r"[^a-z0-9]+", stem) if t]
+    joined = " ".join(tokens)
+    for name, code in REGION_NAMES.items():
+        if re.search(r"\b" + re.escape(name.replace("-", " ")) + r"\b", joined):
+            return code
+    for token in tokens:
+        if token in FILENAME_CODES:
+            return FILENAME_CODES[token]
+    return None
+
+
+def region_from_text(text: str) -> Optional[str]:
+    """Region code named in a question, e.g. "the Washington member guide" -> "WA"."""
+    match = _QUERY_PATTERN.search(text or "")
+    return REGION_NAMES[match.group(1).lower()] if match else None
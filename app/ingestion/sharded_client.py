@@ -0,0 +1,137 @@
+# project-rag-kaiser/app/ingestion/sharded_client.py
+"""
+Sharded ingestion: spread chunks over CHROMA_SHARDS collections.
+
+Shard ``i`` of collection ``project_rag`` is the collection
+``project_rag_shard0i`` in the same persist directory, so snapshots, the text
+store and maintenance keep working per directory. A chunk's shard is derived
+from the same fields as its id (see chroma_client.chunk_id), so a re-ingested
+chunk always lands in the shard that already holds it and is skipped there.
+
+SHARD_KEY picks the spread:
+
+    source_file  all chunks of a document share a shard (default)
+    chunk        chunks are spread by id, which balances shards evenly
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.ingestion.chroma_client import ChromaClient, chunk_id
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEYS = ("source_file", "chunk")
+
+
+def shard_collection_names(collection_name: str, shards: int) -> List[str]:
+    """Collection names of the shards; an unsharded index keeps the plain name."""
+    if shards <= 1:
+        return [collection_name]
+    return [f"{collection_name}_shard{i:02d}" for i in range(shards)]
+
+
+def shard_layout(client, collection_name: str) -> List[str]:
+    """Names of the ``<collection>_shardNN`` collections present in a Chroma client, sorted."""
+    pattern = re.compile(re.escape(collection_name) + r"_shard\d{2}$")
+    return sorted(c.name for c in client.list_collections() if pattern.match(c.name))
+
+
+def shard_for(text: str, metadata: dict, shards: int, key: Optional[str] = None) -> int:
+    """Index of the shard a chunk belongs to."""
+    key = key or settings.SHARD_KEY
+    if shards <= 1:
+        return 0
+    if key == "chunk":
+        return int(chunk_id(text, metadata)[:8], 16) % shards
+    return zlib.crc32(str(metadata.get("source_file", "")).encode("utf-8")) % shards
+
+
+class ShardedChromaClient:
+    """ChromaClient-compatible insert target that routes each chunk to its shard."""
+
+    def __init__(self, collection_name: str | None = None, persist_dir: str | None = None,
+                 shards: Optional[int] = None, shard_key: Optional[str] = None):
+        self.persist_dir = persist_dir or os.getenv("CHROMA_PERSIST_DIR", "data/embeddings/chroma")
+        self.collection_name = collection_name or os.getenv("CHROMA_COLLECTION", "project_rag")
+        self.shards = shards or settings.CHROMA_SHARDS
+        self.shard_key = shard_key or settings.SHARD_KEY
+        if self.shard_key not in SHARD_KEYS:
+            raise ValueError(f"SHARD_KEY must be one of {SHARD_KEYS}, got {self.shard_key!r}")
+        self.collection_names = shard_collection_names(self.collection_name, self.shards)
+        self.clients = [ChromaClient(collection_name=name, persist_dir=self.persist_dir)
+                        for name in self.collection_names]
+        # One text store per persist dir: shards share it (and its write lock)
+        self.text_store = self.clients[0].text_store
+        for client in self.clients:
+            client.text_store = self.text_store
+        self.enabled = all(client.enabled for client in self.clients)
+        if self.enabled:
+            logger.info("Sharded Chroma client initialized (persist_dir=%s, collection=%s, shards=%d, key=%s)",
+                        self.persist_dir, self.collection_name, len(self.clients), self.shard_key)
+
+    @property
+    def collections(self) -> list:
+        return [client.collection for client in self.clients]
+
+    def count(self) -> int:
+        return sum(collection.count() for collection in self.collections)
+
+    def _group(self, chunks: List[str], metadatas: List[dict]) -> dict:
+        rows = defaultdict(list)
+        for n, (chunk, meta) in enumerate(zip(chunks, metadatas)):
+            rows[shard_for(chunk, meta, self.shards, self.shard_key)].append(n)
+        return rows
+
+    def max_batch_size(self) -> int:
+        return min(client.max_batch_size() for client in self.clients)
+
+    def new_chunks(self, chunks: List[str], metadatas: List[dict]) -> Tuple[List[str], List[int]]:
+        """See ChromaClient.new_chunks; each shard is checked for the chunks routed to it."""
+        found = []
+        for shard, members in self._group(chunks, metadatas).items():
+            ids, rows = self.clients[shard].new_chunks([chunks[n] for n in members],
+                                                       [metadatas[n] for n in members])
+            found.extend((members[row], cid) for cid, row in zip(ids, rows))
+        found.sort()
+        return [cid for _, cid in found], [n for n, _ in found]
+
+    def write_batch(self, ids: List[str], embeddings: List[List[float]], chunks: List[str],
+                    metadatas: List[dict]) -> None:
+        """See ChromaClient.write_batch; rows are split by shard. Raises on failure."""
+        for shard, members in sorted(self._group(chunks, metadatas).items()):
+            self.clients[shard].write_batch([ids[n] for n in members], [embeddings[n] for n in members],
+                                            [chunks[n] for n in members], [metadatas[n] for n in members])
+
+    def persist(self) -> None:
+        for client in self.clients:
+            client.persist()
+
+    def insert(self, embeddings: List[List[float]], chunks: List[str], metadatas: List[dict]) -> int:
+        """
+        Insert chunks into their shards (see ChromaClient.insert).
+
+        Returns:
+            Number of chunks newly stored across all shards
+        """
+        if not self.enabled:
+            logger.info("Sharded Chroma client disabled — skipping insert of %d chunks", len(chunks))
+            return 0
+        if len(chunks) != len(metadatas) or len(chunks) != len(embeddings):
+            logger.error("Embeddings, chunks and metadatas length mismatch: %d, %d, %d",
+                         len(embeddings), len(chunks), len(metadatas))
+            return 0
+
+        rows = self._group(chunks, metadatas)
+        stored = 0
+        for shard, members in sorted(rows.items()):
+            stored += self.clients[shard].insert([embeddings[n] for n in members],
+                                                 [chunks[n] for n in members],
+                                                 [metadatas[n] for n in members])
+        return stored
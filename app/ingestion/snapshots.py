@@ -0,0 +1,139 @@
+# project-rag-kaiser/app/ingestion/snapshots.py
+"""
+Blue/green index snapshots.
+
+Each rebuild writes a fresh Chroma persist directory under
+INDEX_SNAPSHOT_ROOT/<version>/. Once validated, the ``CURRENT`` pointer file is
+replaced atomically (write to a temp file + os.replace), and running
+Retrievers switch to the new snapshot on their next reload check. Old
+snapshots beyond INDEX_SNAPSHOTS_KEEP are garbage-collected.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from app.core.config import settings
+from app.ingestion.sharded_client import shard_collection_names
+
+try:
+    from chromadb import PersistentClient
+except Exception:
+    PersistentClient = None
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "CURRENT"
+
+
+class SnapshotValidationError(ValueError):
+    """Raised when a freshly built snapshot is not fit to serve."""
+
+
+class SnapshotManager:
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.INDEX_SNAPSHOT_ROOT)
+        self.pointer_path = self.root / POINTER_FILE
+
+    def current(self) -> Optional[dict]:
+        """Return the active snapshot record, or None when no snapshot is active."""
+        try:
+            record = json.loads(self.pointer_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception("Unreadable snapshot pointer %s", self.pointer_path)
+            return None
+        record["path"] = str(self.root / record["version"])
+        return record
+
+    def pointer_mtime(self) -> Optional[float]:
+        try:
+            return self.pointer_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def versions(self) -> List[str]:
+        """All snapshot versions on disk, oldest first (versions sort by creation time)."""
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def new_snapshot(self) -> Path:
+        """Create an empty directory for the next build."""
+        version = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        path = self.root / version
+        path.mkdir(parents=True, exist_ok=False)
+        logger.info("Building new index snapshot %s", path)
+        return path
+
+    def validate(self, path: Path, collection_name: str, min_chunks: int = 1, shards: int = 1) -> int:
+        """
+        Check a built snapshot before activating it: the collection (or its
+        ``shards`` shard collections together) must hold at least ``min_chunks``
+        chunks and a stored vector must retrieve itself. Returns the chunk count.
+        """
+        if PersistentClient is None:
+            raise SnapshotValidationError("chromadb not installed")
+        client = PersistentClient(path=str(path))
+        count = 0
+        for name in shard_collection_names(collection_name, shards):
+            try:
+                collection = client.get_collection(name=name)
+            except Exception as e:
+                raise SnapshotValidationError(f"Collection {name!r} missing in {path}") from e
+            size = collection.count()
+            count += size
+            if not size:
+                continue  # a shard may legitimately be empty
+            sample = collection.get(limit=1, include=["embeddings"])
+            result = collection.query(query_embeddings=[list(sample["embeddings"][0])], n_results=1, include=[])
+            if not result.get("ids") or sample["ids"][0] not in result["ids"][0]:
+                raise SnapshotValidationError(f"Snapshot {path} failed the self-retrieval check on {name!r}")
+        if count < max(1, min_chunks):
+            raise SnapshotValidationError(f"Snapshot {path} has {count} chunks, expected at least {min_chunks}")
+        logger.info("Validated snapshot %s (%d chunks)", path, count)
+        return count
+
+    def activate(self, path: Path, collection_name: str, chunks: int) -> dict:
+        """Atomically point CURRENT at ``path``."""
+        record = {
+            "version": Path(path).name,
+            "collection": collection_name,
+            "chunks": chunks,
+            "activated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        tmp = self.pointer_path.with_name(f".{POINTER_FILE}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(record, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.pointer_path)
+        logger.info("Activated index snapshot %s", record["version"])
+        return record
+
+    def gc(self, keep: Optional[int] = None) -> List[str]:
+        """
+        Delete old snapshots, keeping the active one plus the newest ``keep``
+        versions (the previous snapshot stays until readers have switched).
+        """
+        keep = settings.INDEX_SNAPSHOTS_KEEP if keep is None else keep
+        current = self.current()
+        active = current["version"] if current else None
+        versions = self.versions()
+        retained = set(versions[-keep:]) if keep > 0 else set()
+        removed = []
+        for version in versions:
+            if version == active or version in retained:
+                continue
+            shutil.rmtree(self.root / version, ignore_errors=True)
+            removed.append(version)
+        if removed:
+            logger.info("Garbage-collected %d old snapshots: %s", len(removed), removed)
+        return removed
@@ -0,0 +1,108 @@
+# project-rag-kaiser/app/ingestion/text_store.py
+"""
+Out-of-line chunk text store.
+
+Chunk texts are appended to a single blob file (``texts.bin`` in the Chroma
+persist directory) instead of being stored as Chroma ``documents``. Each
+chunk's metadata records where its text lives:
+
+    text_offset  byte offset in texts.bin
+    text_length  stored byte length
+    text_zlib    True when the record is zlib-compressed
+
+Records are compressed individually (when TEXT_STORE_COMPRESS is set and it
+saves space), so any chunk can be read without its neighbours. Reads go
+through a read-only mmap, so only the final top-k texts are ever touched.
+"""
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TEXT_FILE = "texts.bin"
+# Metadata keys that address a chunk's text; not part of the chunk's public metadata
+TEXT_KEYS = ("text_offset", "text_length", "text_zlib")
+
+
+class TextStore:
+    def __init__(self, persist_dir: str, compress: Optional[bool] = None):
+        self.path = Path(persist_dir) / TEXT_FILE
+        self.compress = settings.TEXT_STORE_COMPRESS if compress is None else compress
+        self._write_lock = threading.Lock()
+        self._map_lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+
+    @classmethod
+    def open(cls, persist_dir: str) -> Optional["TextStore"]:
+        """The store in ``persist_dir``, or None for collections that keep texts in Chroma."""
+        store = cls(persist_dir)
+        return store if store.path.exists() else None
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, texts: Iterable[str]) -> List[dict]:
+        """Append ``texts`` and return the metadata fields addressing each one."""
+        records, refs = [], []
+        for text in texts:
+            raw = text.encode("utf-8")
+            packed = zlib.compress(raw, 6) if self.compress else raw
+            compressed = self.compress and len(packed) < len(raw)
+            records.append(packed if compressed else raw)
+            refs.append(compressed)
+        with self._write_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as fh:
+                offset = fh.seek(0, os.SEEK_END)
+                out = []
+                for record, compressed in zip(records, refs):
+                    out.append({"text_offset": offset, "text_length": len(record), "text_zlib": compressed})
+                    offset += len(record)
+                fh.write(b"".join(records))
+                fh.flush()
+                os.fsync(fh.fileno())
+        return out
+
+    def _view(self, end: int) -> mmap.mmap:
+        current = self._map
+        if current is not None and end <= len(current):
+            return current
+        with self._map_lock:
+            # The file only grows; remap when a record lies past the current mapping.
+            # Old maps are left to the GC since other threads may still be reading them.
+            if self._map is None or end > len(self._map):
+                with open(self.path, "rb") as fh:
+                    self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if end > len(self._map):
+                raise ValueError(f"Text record ends at {end}, past the end of {self.path}")
+            return self._map
+
+    def read(self, metadata: dict) -> Optional[str]:
+        """Text addressed by a chunk's metadata; None if the chunk has no text reference."""
+        offset = metadata.get("text_offset")
+        if offset is None:
+            return None
+        end = offset + metadata["text_length"]
+        data = self._view(end)[offset:end]
+        if metadata.get("text_zlib"):
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+
+def public_metadata(metadata: dict) -> dict:
+    """Chunk metadata without the text store addressing keys."""
+    if not any(key in metadata for key in TEXT_KEYS):
+        return metadata
+    return {k: v for k, v in metadata.items() if k not in TEXT_KEYS}
@@ -1,13 +1,21 @@
 # project-rag-kaiser/app/main.py
 import os
 import logging
+import threading
+import uuid
 import warnings
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from urllib3.exceptions import NotOpenSSLWarning
-from rag.query_pipeline import RAGPipeline 
 from app.api.v1.router import router as v1_router
-from app.core.logging_config import setup_logging
+from app.core.config import settings
+from app.core.logging_config import request_id_var, setup_logging
+from app.core.metrics import REGISTRY
+from app.core.query_log import QueryLog
+from app.core.startup import StartupState, preloaded
 
 # Load .env file
 load_dotenv()
@@ -27,11 +35,55 @@ app = FastAPI(
 
 
 app.include_router(v1_router)
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_BYTES)
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag every log record for this request with X-Request-ID (generated if absent)."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def _load_pipeline(state: StartupState, top_k: int, query_log: Optional[QueryLog] = None):
+    """Import, build and warm the RAG pipeline off the event loop."""
+    try:
+        state.begin("import")
+        # Heavy imports (langchain, torch, chromadb) happen here, not at app import
+        from rag.query_pipeline import RAGPipeline
+
+        state.begin("load")
+        pipeline = RAGPipeline(top_k=top_k, embeddings=preloaded("embeddings"))
+
+        state.begin("warmup")
+        pipeline.warm_up()
+
+        if query_log is not None:
+            # Replay the most frequent logged questions so the first real ones hit warm caches
+            state.begin("replay")
+            questions = query_log.top()
+            state.update(replay_total=len(questions), replay_done=0)
+            done = pipeline.replay(questions, progress=lambda n: state.update(replay_done=n))
+            logger.info("Replayed %d/%d logged questions", done, len(questions))
+
+        app.state.rag_pipeline = pipeline
+        state.ready()
+        logger.info("RAG Pipeline initialized successfully.")
+    except Exception as e:
+        app.state.rag_pipeline = None
+        state.fail(e)
+        logger.exception("Failed to initialize RAG Pipeline.")
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize global resources (RAG Pipeline)."""
+    """Start loading global resources (RAG Pipeline) in the background."""
      
     DEFAULT_TOP_K = 5
     try:
@@ -39,17 +91,21 @@ async def startup_event():
     except ValueError:
         top_k = DEFAULT_TOP_K
 
-    logger.info("Initializing RAG pipeline (top_k=%s)...", top_k)
-    try:
-        app.state.rag_pipeline = RAGPipeline(top_k=top_k)
-        logger.info("RAG Pipeline initialized successfully.")
-    except Exception:
-        app.state.rag_pipeline = None
-        logger.exception("Failed to initialize RAG Pipeline.")
+    app.state.rag_pipeline = None
+    app.state.startup = StartupState()
+    app.state.query_log = QueryLog() if settings.QUERY_LOG_ENABLED else None
+    logger.info("Initializing RAG pipeline in the background (top_k=%s)...", top_k)
+    threading.Thread(
+        target=_load_pipeline, args=(app.state.startup, top_k, app.state.query_log), name="rag-startup",
+        daemon=True
+    ).start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    query_log = getattr(app.state, "query_log", None)
+    if query_log is not None:
+        query_log.flush()
     pipeline = getattr(app.state, "rag_pipeline", None)
     if pipeline:
         try:
@@ -68,5 +124,14 @@ async def root():
         "name": "Kaiser RAG API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/v1/health"
+        "health": "/v1/health",
+        "liveness": "/v1/health/live",
+        "readiness": "/v1/health/ready",
+        "metrics": "/metrics"
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,139 @@
+# project-rag-kaiser/app/prefork.py
+"""
+Pre-fork server: load the embedding model once, then fork uvicorn workers.
+
+``uvicorn --workers N`` spawns fresh interpreters, so every worker loads its own
+copy of the MiniLM weights. Here the parent imports the app, loads the model
+weights and freezes the GC, then forks N workers that share those pages
+copy-on-write. Each worker opens its own Chroma client after the fork (SQLite
+handles and background threads must not cross a fork); the index files
+themselves are shared through the OS page cache.
+
+    python -m app.prefork --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Serve the RAG API with pre-forked workers")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--threads-per-worker", type=int, default=None,
+                   help="torch intra-op threads per worker (default: cores // workers)")
+    p.add_argument("--log-level", default="info")
+    return p.parse_args()
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _preload():
+    """Load shared, read-only state in the parent. No inference runs here:
+    initialising torch's thread pool before fork can deadlock the children."""
+    from app.core.startup import preload
+    from rag.query_pipeline import RAGPipeline
+
+    start = time.perf_counter()
+    preload("embeddings", RAGPipeline.load_embeddings())
+    logger.info("Preloaded embedding model in %.0f ms", (time.perf_counter() - start) * 1000.0)
+
+
+def _run_worker(sock: socket.socket, args, threads: int):
+    import uvicorn
+
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    from app.main import app
+
+    config = uvicorn.Config(app, log_level=args.log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    args = parse_args()
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // max(1, args.workers))
+
+    # Importing the app pulls in its modules once, so their code objects are shared too
+    import app.main  # noqa: F401
+
+    _preload()
+    sock = _bind(args.host, args.port)
+
+    # Move everything allocated so far to a permanent generation the collector
+    # never scans, so GC passes in workers do not dirty (and un-share) the pages
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                _run_worker(sock, args, threads)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        logger.info("Started worker %d (pid %d, %d torch threads)", slot, pid, threads)
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(args.workers):
+        spawn(slot)
+    logger.info("Serving on %s:%d with %d pre-forked workers (parent pid %d)",
+                args.host, args.port, args.workers, os.getpid())
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is None:
+            continue
+        if not stopping:
+            logger.warning("Worker %d (pid %d) exited with status %d; restarting", slot, pid, status)
+            time.sleep(1)
+            spawn(slot)
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
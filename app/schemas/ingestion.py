@@ -1,6 +1,9 @@
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, List, Dict
 
+# Chunk metadata fields that retrieval can filter on
+FILTERABLE_FIELDS = ("source_file", "region", "document_type", "version", "title", "chapter", "page")
+
 
 class DocumentMetadata(BaseModel):
     source_url: Optional[HttpUrl] = None
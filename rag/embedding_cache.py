@@ -0,0 +1,43 @@
+# project-rag-kaiser/rag/embedding_cache.py
+"""LRU cache of query embeddings, keyed by normalized question."""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.core.query_log import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    def __init__(self, embed: Callable[[str], List[float]], size: Optional[int] = None):
+        self.embed = embed
+        self.size = settings.QUERY_EMBED_CACHE_SIZE if size is None else size
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def embed_query(self, question: str) -> List[float]:
+        if self.size <= 0:
+            return self.embed(question)
+        key = normalize_question(question)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+        record_cache("query_embedding", vector is not None)
+        if vector is not None:
+            return vector
+        # Computed outside the lock; concurrent misses on one key just embed twice
+        vector = self.embed(question)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return vector
@@ -1,41 +1,33 @@
 # project-rag-kaiser/rag/generator.py
 import logging
-from typing import List
-from langchain_openai import ChatOpenAI
+from typing import List, Optional
 from app.core.config import settings
+from app.core.metrics import LLM_ERRORS, QUERY_STAGE_SECONDS, StageTimer
+from rag.llm_backends import build_llm
 
 logger = logging.getLogger(__name__)
 
 
+class GenerationError(RuntimeError):
+    """Raised when the LLM call fails; the pipeline reports it as an error result."""
+
+
 class Generator:
-    def __init__(self, model: str = "gpt-4-turbo"):
+    ERROR_ANSWER = "I encountered an error while generating a response. Please try again."
+
+    def __init__(self, model: str = "gpt-4-turbo", backend: Optional[str] = None):
         self.model = model
-        self.llm = ChatOpenAI(
-            model=model,
-            api_key=settings.OPENAI_API_KEY,
-            temperature=0.2 
-        )
-        logger.info("Generator initialized with model: %s", model)
-
-    def generate(self, query: str, context_chunks: List[str]) -> str:
-        """
-        Generate an answer based on query and retrieved context.
-        
-        Args:
-            query: User's question
-            context_chunks: List of relevant document chunks
-            
-        Returns:
-            Generated response string
-        """
-        if not context_chunks:
-            return "I don't have enough information to answer your question."
+        self.backend = backend or settings.LLM_BACKEND
+        self.llm = build_llm(model, backend=self.backend, temperature=0.2)
+        logger.info("Generator initialized with model: %s (backend=%s)", model, self.backend)
 
+    def build_prompt(self, query: str, context_chunks: List[str]) -> str:
+        """Build the LLM prompt from the question and retrieved context."""
         # Build context string
         context = "\n\n".join([f"[Context {i+1}]:\n{chunk}" for i, chunk in enumerate(context_chunks)])
 
         # Create the prompt
-        prompt = f"""You are a helpful assistant answering questions about Kaiser health insurance policies and member guides.
+        return f"""You are a helpful assistant answering questions about Kaiser health insurance policies and member guides.
 
 Use the following context to answer the question. If the answer is not in the context, say so clearly.
 
@@ -46,11 +38,35 @@ QUESTION: {query}
 
 ANSWER:"""
 
+    def generate(self, query: str, context_chunks: List[str], timer: Optional[StageTimer] = None) -> str:
+        """
+        Generate an answer based on query and retrieved context.
+        
+        Args:
+            query: User's question
+            context_chunks: List of relevant document chunks
+            timer: Optional per-request timer; records "prompt" and "generate" stages
+            
+        Returns:
+            Generated response string
+
+        Raises:
+            GenerationError: the LLM call failed
+        """
+        if not context_chunks:
+            return "I don't have enough information to answer your question."
+
+        timer = timer or StageTimer(QUERY_STAGE_SECONDS)
+        with timer.stage("prompt"):
+            prompt = self.build_prompt(query, context_chunks)
+
         try:
-            response = self.llm.invoke(prompt)
+            with timer.stage("generate"):
+                response = self.llm.invoke(prompt)
             answer = response.content if hasattr(response, 'content') else str(response)
             logger.info("Generated response for query: %s", query[:50])
             return answer
-        except Exception:
+        except Exception as exc:
+            LLM_ERRORS.inc(backend=self.backend)
             logger.exception("Error generating response")
-            return "I encountered an error while generating a response. Please try again."
+            raise GenerationError(str(exc)) from exc
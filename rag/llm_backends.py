@@ -0,0 +1,114 @@
+# project-rag-kaiser/rag/llm_backends.py
+"""LLM backends for the Generator.
+
+``openai`` wraps langchain's ChatOpenAI. ``fake`` is a local stand-in with the
+same ``invoke``/``stream`` surface, used for offline development and load
+testing: answers are deterministic for a given prompt, while latency, token
+rate and failures follow the FAKE_LLM_* settings.
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from typing import Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FakeLLMError(RuntimeError):
+    """Injected failure raised by FakeChatModel."""
+
+
+class FakeMessage:
+    """Minimal stand-in for a langchain AIMessage / AIMessageChunk."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Deterministic offline chat model.
+
+    Latency is time-to-first-token drawn from a log-normal distribution around
+    ``latency_ms`` plus one token every ``1 / tokens_per_sec`` seconds.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.3,
+        tokens_per_sec: float = 50.0,
+        failure_rate: float = 0.0,
+        max_tokens: int = 120,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.failure_rate = failure_rate
+        self.max_tokens = max_tokens
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _draw(self):
+        with self._rng_lock:
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if self.latency_ms <= 0:
+                ttft = 0.0
+            else:
+                ttft = self.latency_ms / 1000.0 * self._rng.lognormvariate(0.0, self.latency_sigma)
+        return fail, ttft
+
+    def _answer_tokens(self, prompt: str) -> list:
+        # Echo the start of the first context block so answers look grounded
+        match = re.search(r"\[Context 1\]:\n(.*?)(?:\n\n\[Context|\n\nQUESTION:)", prompt, re.S)
+        source = match.group(1) if match else prompt
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        words = f"[fake-llm {digest}] Based on the provided context: {source}".split()
+        return words[: self.max_tokens]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def invoke(self, prompt: str) -> FakeMessage:
+        fail, ttft = self._draw()
+        tokens = self._answer_tokens(prompt)
+        time.sleep(ttft + self._token_delay() * len(tokens))
+        if fail:
+            raise FakeLLMError("Injected fake LLM failure")
+        return FakeMessage(" ".join(tokens))
+
+    def stream(self, prompt: str) -> Iterator[FakeMessage]:
+        fail, ttft = self._draw()
+        tokens = self._answer_tokens(prompt)
+        time.sleep(ttft)
+        delay = self._token_delay()
+        for i, token in enumerate(tokens):
+            if fail and i >= len(tokens) // 2:
+                raise FakeLLMError("Injected fake LLM failure mid-stream")
+            if delay:
+                time.sleep(delay)
+            yield FakeMessage(token if i == 0 else " " + token)
+
+
+def build_llm(model: str, backend: Optional[str] = None, temperature: float = 0.2):
+    """Construct the chat model for ``backend`` (defaults to LLM_BACKEND)."""
+    backend = (backend or settings.LLM_BACKEND).lower()
+    if backend == "fake":
+        return FakeChatModel(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            latency_sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+            tokens_per_sec=settings.FAKE_LLM_TOKENS_PER_SEC,
+            failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+            seed=settings.FAKE_LLM_SEED,
+        )
+    if backend == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(model=model, api_key=settings.OPENAI_API_KEY, temperature=temperature)
+    raise ValueError(f"Unknown LLM_BACKEND: {backend!r} (expected 'openai' or 'fake')")
@@ -0,0 +1,291 @@
+# project-rag-kaiser/rag/quantized_index.py
+"""
+int8 scalar-quantized candidate index with exact re-ranking.
+
+Each stored vector is quantized per dimension to one signed byte
+(x ~= minimum + scale * (code + 128)), so the scanned index costs ``dim`` bytes
+per vector instead of ``4 * dim``. A query scans the codes to over-fetch
+``n * overfetch`` candidates, then re-ranks only those with the full-precision
+vectors, which stay on disk and are memory-mapped (only touched rows are paged
+in). Distances are squared L2, matching Chroma's default space, so scores
+line up with the HNSW path.
+
+Posting lists map each filterable metadata value (region, source file,
+chapter, ...) to its rows, so a filtered query scans only its partition.
+
+Files live in ``<persist_dir>/quantized/`` next to the Chroma index they were
+built from:
+
+    codes.i8.npy     int8   (N, dim)  scanned for candidates
+    norms.f32.npy    float32 (N,)     exact squared norms
+    vectors.f32.npy  float32 (N, dim) full precision, re-rank only
+    params.npz       per-dimension minimum and scale
+    postings.i32.npy row numbers grouped by (field, value)
+    postings.json    {field: {value: [start, stop]}} into postings.i32.npy
+    ids.json         Chroma ids, row-aligned
+    meta.json        collection, count, dim, built_at
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.schemas.ingestion import FILTERABLE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = "quantized"
+CODES_FILE = "codes.i8.npy"
+NORMS_FILE = "norms.f32.npy"
+VECTORS_FILE = "vectors.f32.npy"
+PARAMS_FILE = "params.npz"
+IDS_FILE = "ids.json"
+POSTINGS_FILE = "postings.i32.npy"
+POSTINGS_INDEX_FILE = "postings.json"
+META_FILE = "meta.json"
+
+# Rows dequantized per matrix-vector product; bounds the float32 scratch buffer
+SCAN_BLOCK = 16384
+
+
+def index_path(persist_dir: str) -> Path:
+    return Path(persist_dir) / INDEX_DIR
+
+
+def _pages(collection, batch: int, include=("embeddings",)):
+    offset = 0
+    while True:
+        page = collection.get(include=list(include), limit=batch, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        yield ids, np.asarray(page["embeddings"], dtype=np.float32), page.get("metadatas") or [None] * len(ids)
+        offset += len(ids)
+
+
+class QuantizedIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        self.ids: List[str] = json.loads((self.path / IDS_FILE).read_text(encoding="utf-8"))
+        params = np.load(self.path / PARAMS_FILE)
+        self.minimum = params["minimum"].astype(np.float32)
+        self.scale = params["scale"].astype(np.float32)
+        # Memory-mapped: pre-forked workers share the pages through the page cache
+        self.codes = np.load(self.path / CODES_FILE, mmap_mode="r")
+        self.norms = np.load(self.path / NORMS_FILE, mmap_mode="r")
+        self.vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.posting_rows = np.empty(0, dtype=np.int32)
+        if (self.path / POSTINGS_INDEX_FILE).exists():
+            self.postings = json.loads((self.path / POSTINGS_INDEX_FILE).read_text(encoding="utf-8"))
+            self.posting_rows = np.load(self.path / POSTINGS_FILE, mmap_mode="r")
+        if not (len(self.ids) == len(self.codes) == len(self.norms) == len(self.vectors)):
+            raise ValueError(f"Quantized index {self.path} is inconsistent")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.codes.shape[1])
+
+    @classmethod
+    def load(cls, persist_dir: str, collection_name: Optional[str] = None,
+             count: Optional[int] = None) -> Optional["QuantizedIndex"]:
+        """
+        Open the index built for ``persist_dir``; None when there is none, it is
+        unusable, or it is stale (built for another collection, or for another
+        number of vectors than the collection's ``count``).
+        """
+        path = index_path(persist_dir)
+        if not (path / META_FILE).exists():
+            return None
+        try:
+            index = cls(path)
+        except Exception:
+            logger.exception("Failed to open quantized index %s", path)
+            return None
+        if collection_name and index.meta.get("collection") != collection_name:
+            logger.warning("Quantized index %s was built for collection %r, not %r; ignoring it",
+                           path, index.meta.get("collection"), collection_name)
+            return None
+        if count is not None and len(index) != count:
+            logger.warning("Quantized index %s holds %d vectors but the collection holds %d; ignoring the "
+                           "stale index (rebuild it with scripts/build_quantized_index.py)", path, len(index), count)
+            return None
+        return index
+
+    @classmethod
+    def build(cls, collection, persist_dir: str, batch: int = 5000) -> "QuantizedIndex":
+        """
+        Build the index from every vector in ``collection``, streaming it twice
+        (value ranges, then codes) so the collection is never held in memory.
+        The files are written to a temporary directory and moved into place.
+        """
+        start = time.perf_counter()
+        total = collection.count()
+        if not total:
+            raise ValueError(f"Collection {collection.name!r} is empty")
+
+        low = high = None
+        for _, vectors, _ in _pages(collection, batch):
+            page_low, page_high = vectors.min(axis=0), vectors.max(axis=0)
+            low = page_low if low is None else np.minimum(low, page_low)
+            high = page_high if high is None else np.maximum(high, page_high)
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0
+
+        final = index_path(persist_dir)
+        tmp = final.with_name(f".{INDEX_DIR}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        dim = low.shape[0]
+        codes = np.lib.format.open_memmap(tmp / CODES_FILE, mode="w+", dtype=np.int8, shape=(total, dim))
+        full = np.lib.format.open_memmap(tmp / VECTORS_FILE, mode="w+", dtype=np.float32, shape=(total, dim))
+        norms = np.lib.format.open_memmap(tmp / NORMS_FILE, mode="w+", dtype=np.float32, shape=(total,))
+        ids: List[str] = []
+        postings: Dict[str, Dict[str, array]] = {field: {} for field in FILTERABLE_FIELDS}
+        for page_ids, vectors, metadatas in _pages(collection, batch, include=("embeddings", "metadatas")):
+            rows = slice(len(ids), len(ids) + len(page_ids))
+            if rows.stop > total:
+                raise RuntimeError(f"Collection {collection.name!r} changed while building the index")
+            quantized = np.rint((vectors - low) / scale) - 128.0
+            codes[rows] = np.clip(quantized, -128, 127).astype(np.int8)
+            full[rows] = vectors
+            norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+            for row, meta in enumerate(metadatas or [], start=rows.start):
+                for field, lists in postings.items():
+                    value = (meta or {}).get(field)
+                    if value is not None and value != "":
+                        lists.setdefault(str(value), array("i")).append(row)
+            ids.extend(page_ids)
+        if len(ids) != total:
+            raise RuntimeError(f"Collection {collection.name!r} changed while building the index")
+        for mapped in (codes, full, norms):
+            mapped.flush()
+        del codes, full, norms
+
+        np.savez(tmp / PARAMS_FILE, minimum=low, scale=scale)
+        directory, chunks, offset = {}, [], 0
+        for field, lists in postings.items():
+            for value, rows in lists.items():
+                directory.setdefault(field, {})[value] = [offset, offset + len(rows)]
+                chunks.append(np.frombuffer(rows, dtype=np.int32))
+                offset += len(rows)
+        np.save(tmp / POSTINGS_FILE, np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32))
+        (tmp / POSTINGS_INDEX_FILE).write_text(json.dumps(directory), encoding="utf-8")
+        (tmp / IDS_FILE).write_text(json.dumps(ids), encoding="utf-8")
+        meta = {
+            "collection": collection.name,
+            "count": total,
+            "dim": int(dim),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        (tmp / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+        # Readers that still map the old files keep them until they let go
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        logger.info("Built quantized index %s (%d vectors, dim %d) in %.1fs",
+                    final, total, dim, time.perf_counter() - start)
+        return cls(final)
+
+    def memory_per_vector(self) -> dict:
+        """Bytes per stored vector: what the scan keeps resident vs the float32 baseline."""
+        ids_bytes = (self.path / IDS_FILE).stat().st_size / max(1, len(self))
+        resident = self.dim + 4  # int8 codes + float32 squared norm
+        return {
+            "float32_bytes": self.dim * 4,
+            "int8_code_bytes": self.dim,
+            "norm_bytes": 4,
+            "id_bytes": round(ids_bytes, 1),
+            "scan_resident_bytes": resident,
+            "compression": round(self.dim * 4 / resident, 2),
+        }
+
+    def rows_for(self, where: dict) -> Optional[np.ndarray]:
+        """
+        Sorted rows matching a Chroma ``where`` clause built from equality,
+        ``$in`` and ``$and`` conditions; None when the posting lists cannot
+        answer it (unindexed field or other operator).
+        """
+        if "$and" in where:
+            matched = None
+            for clause in where["$and"]:
+                rows = self.rows_for(clause)
+                if rows is None:
+                    return None
+                matched = rows if matched is None else np.intersect1d(matched, rows, assume_unique=True)
+            return matched
+        if len(where) != 1:
+            return None
+        (field, condition), = where.items()
+        lists = self.postings.get(field)
+        if lists is None:
+            return None
+        if isinstance(condition, dict):
+            if set(condition) == {"$in"}:
+                values = condition["$in"]
+            elif set(condition) == {"$eq"}:
+                values = [condition["$eq"]]
+            else:
+                return None
+        else:
+            values = [condition]
+        parts = [self.posting_rows[start:stop] for start, stop in (lists[str(v)] for v in values if str(v) in lists)]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts).astype(np.int64))
+
+    def _candidates(self, query: np.ndarray, k: int, subset: Optional[np.ndarray] = None) -> np.ndarray:
+        """Row indices of the ``k`` smallest approximate distances, within ``subset`` if given."""
+        # ||q - x||^2 = ||x||^2 - 2 q.x + const, with q.x ~= (q * scale) . code + const
+        weights = query * self.scale
+        best_rows = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float32)
+        total = len(self) if subset is None else len(subset)
+        for start in range(0, total, SCAN_BLOCK):
+            stop = min(start + SCAN_BLOCK, total)
+            if subset is None:
+                rows = np.arange(start, stop)
+                codes, norms = self.codes[start:stop], self.norms[start:stop]
+            else:
+                rows = subset[start:stop]
+                codes, norms = self.codes[rows], self.norms[rows]
+            approx = norms - 2.0 * (codes.astype(np.float32) @ weights)
+            if len(approx) > k:
+                keep = np.argpartition(approx, k - 1)[:k]
+                approx, rows = approx[keep], rows[keep]
+            best_dist = np.concatenate([best_dist, approx])
+            best_rows = np.concatenate([best_rows, rows])
+            if len(best_dist) > k:
+                keep = np.argpartition(best_dist, k - 1)[:k]
+                best_dist, best_rows = best_dist[keep], best_rows[keep]
+        return best_rows
+
+    def search(self, query_embedding, n: int, overfetch: int = 4,
+               subset: Optional[np.ndarray] = None) -> Tuple[List[str], List[float]]:
+        """
+        Return the ids and exact squared-L2 distances of the ``n`` nearest
+        vectors, ascending. ``n * overfetch`` quantized candidates are re-ranked.
+        ``subset`` (e.g. from rows_for) restricts the scan to those rows.
+        """
+        total = len(self) if subset is None else len(subset)
+        if n <= 0 or not total:
+            return [], []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        rows = self._candidates(query, min(total, n * max(1, overfetch)), subset)
+        # Sorted row order keeps the reads from the memory-mapped file sequential
+        rows.sort()
+        exact = self.vectors[rows] - query
+        dist = np.einsum("ij,ij->i", exact, exact)
+        order = np.argsort(dist)[:n]
+        return [self.ids[rows[i]] for i in order], [float(dist[i]) for i in order]
@@ -1,49 +1,141 @@
 # project-rag-kaiser/rag/query_pipeline.py
 import logging
-from typing import List, Optional
-from langchain_huggingface import HuggingFaceEmbeddings
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from app.core.config import settings
+from app.core.metrics import (
+    BAND_QUERY_SECONDS,
+    GENERATION_BANDS,
+    QUERY_SECONDS,
+    QUERY_STAGE_SECONDS,
+    StageTimer,
+)
+from app.core.profiling import profile as profile_block, should_profile
+from rag.embedding_cache import EmbeddingCache
 from rag.retriever import Retriever
-from rag.generator import Generator
+from rag.sharded_retriever import ShardedRetriever
+from rag.generator import GenerationError, Generator
+from rag.reranker import Reranker
 
 logger = logging.getLogger(__name__)
 
 
 class RAGPipeline:
-    """End-to-end RAG pipeline: Query -> Embed -> Retrieve -> Generate."""
+    """
+    End-to-end RAG pipeline: Query -> Embed -> Retrieve -> Generate.
 
-    def __init__(self, top_k: int = 5):
+    Generation is gated on the best retrieval score (see ABSTAIN_SCORE_THRESHOLD
+    and CHEAP_SCORE_THRESHOLD): weak matches get a fast "not found" answer with
+    the nearest sources, middling ones go to a cheaper generator configuration.
+    With RERANK_ENABLED, a cross-encoder reorders the retrieved candidates first.
+    """
+
+    WARMUP_QUESTION = "What is covered by Kaiser insurance?"
+    ABSTAIN_ANSWER = ("I couldn't find information about this in the Kaiser documents. "
+                      "The closest sections are listed in the sources.")
+
+    def __init__(self, top_k: int = 5, embeddings=None):
         self.top_k = top_k
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        self.retriever = Retriever()
+        # A preloaded model (e.g. loaded once in a pre-fork parent) can be injected
+        self.embeddings = embeddings if embeddings is not None else self.load_embeddings()
+        self.query_embeddings = EmbeddingCache(self.embeddings.embed_query)
+        self.retriever = ShardedRetriever() if settings.CHROMA_SHARDS > 1 else Retriever()
         self.generator = Generator()
+        self.cheap_generator = (Generator(model=settings.CHEAP_LLM_MODEL)
+                                if settings.CHEAP_SCORE_THRESHOLD is not None else None)
+        self.reranker = Reranker() if settings.RERANK_ENABLED else None
         logger.info("RAG Pipeline initialized (top_k=%d)", top_k)
 
-    def query(self, question: str, top_k: Optional[int] = None) -> dict:
+    @staticmethod
+    def load_embeddings():
+        """Load the query embedding model."""
+        # Imported here so importing this module does not pull in torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        )
+
+    def warm_up(self, question: Optional[str] = None) -> None:
+        """
+        Run the embed + retrieve path once so the first real request does not
+        pay model/tokenizer initialisation and index loading. Skips the LLM.
+        """
+        question = question or self.WARMUP_QUESTION
+        query_embedding = self.embeddings.embed_query(question)
+        # Timer without a histogram: warm-up latency stays out of /metrics
+        self.retriever.retrieve(query_embedding, query_text=question, top_k=self.top_k, timer=StageTimer())
+        if self.reranker is not None:
+            try:
+                self.reranker.warm_up()
+            except Exception:
+                logger.exception("Re-ranker warm-up failed; queries will keep the retrieval order")
+
+    def replay(self, questions: Iterable[str], budget_s: Optional[float] = None,
+               progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Run logged questions through embed + retrieve (no LLM) to fill the
+        embedding cache and page in the index, stopping after ``budget_s``
+        seconds. Calls ``progress(done)`` after each question; returns the
+        number replayed.
+        """
+        budget_s = settings.QUERY_LOG_WARMUP_BUDGET_S if budget_s is None else budget_s
+        deadline = time.monotonic() + budget_s
+        pool = max(self.top_k, self.reranker.max_candidates) if self.reranker is not None else self.top_k
+        done = 0
+        for question in questions:
+            if time.monotonic() >= deadline:
+                logger.info("Query replay budget of %.1fs used up after %d questions", budget_s, done)
+                break
+            query_embedding = self.query_embeddings.embed_query(question)
+            self.retriever.retrieve(query_embedding, query_text=question, top_k=pool, timer=StageTimer())
+            done += 1
+            if progress is not None:
+                progress(done)
+        return done
+
+    def query(self, question: str, top_k: Optional[int] = None, profile: bool = False,
+              filters: Optional[Dict[str, Any]] = None) -> dict:
         """
         Execute the complete RAG pipeline.
 
         Args:
             question: User's question
             top_k: Optional override for number of retrieved chunks
+            profile: Force a cProfile capture for this call (otherwise sampled
+                by PROFILE_SAMPLE_RATE)
+            filters: Optional metadata filters ({field: value or [values]})
 
         Returns:
-            Dictionary with question, context chunks, scores, metadata, and answer
+            Dictionary with question, context chunks, scores, metadata, answer,
+            confidence band and per-stage timings (ms); "profile" holds the
+            pstats path when profiled
         """
+        with profile_block("query", should_profile(profile)) as session:
+            result = self._query(question, top_k, filters)
+        if session is not None and session.path is not None:
+            result["profile"] = str(session.path)
+        return result
+
+    def _query(self, question: str, top_k: Optional[int], filters: Optional[Dict[str, Any]] = None) -> dict:
 
         # effective top_k to use
         k = top_k if top_k is not None else self.top_k
+        timer = StageTimer(QUERY_STAGE_SECONDS)
 
         try:
             # Step 1: Embed the query
             logger.info("Embedding query: %s", question[:50])
-            query_embedding = self.embeddings.embed_query(question)
+            with timer.stage("embed"):
+                query_embedding = self.query_embeddings.embed_query(question)
 
-            # Step 2: Retrieve relevant chunks (with metadata)
-            logger.info("Retrieving top-%d chunks", k)
-            retrieved = self.retriever.retrieve(query_embedding, query_text=question, top_k=k)
+            # Step 2: Retrieve relevant chunks (with metadata); a wider pool when re-ranking
+            pool = max(k, self.reranker.max_candidates) if self.reranker is not None else k
+            logger.info("Retrieving top-%d chunks", pool)
+            retrieved = self.retriever.retrieve(query_embedding, query_text=question, top_k=pool, timer=timer,
+                                                filters=filters)
+            if retrieved and self.reranker is not None:
+                retrieved = self.reranker.rerank(question, retrieved, k, timer=timer)
 
             if not retrieved:
                 logger.warning("No documents retrieved for query")
@@ -53,25 +145,49 @@ class RAGPipeline:
                     "scores": [],
                     "metadata": [],
                     "answer": "I couldn't find relevant information to answer your question.",
-                    "num_chunks": 0
+                    "num_chunks": 0,
+                    "band": "none",
+                    "timings": self._finish(timer, "none"),
                 }
 
             context_chunks = [chunk for chunk, _, _ in retrieved]
             scores = [score for _, score, _ in retrieved]
             metadatas = [meta for _, _, meta in retrieved]
 
-            # Step 3: Generate answer
-            logger.info("Generating answer based on %d retrieved chunks", len(context_chunks))
-            answer = self.generator.generate(question, context_chunks)
+            # Step 3: Generate answer, unless retrieval is too weak to support one
+            band = self._band(max(scores))
+            failed = False
+            if band == "abstain":
+                logger.info("Top score %.3f below abstain threshold; skipping generation", max(scores))
+                answer = self.ABSTAIN_ANSWER
+            elif band == "cheap":
+                context_chunks = context_chunks[:settings.CHEAP_CONTEXT_CHUNKS]
+                scores, metadatas = scores[:len(context_chunks)], metadatas[:len(context_chunks)]
+                logger.info("Generating answer with %s from %d chunks (top score %.3f)",
+                            settings.CHEAP_LLM_MODEL, len(context_chunks), max(scores))
+            else:
+                logger.info("Generating answer based on %d retrieved chunks", len(context_chunks))
+            if band != "abstain":
+                generator = self.cheap_generator if band == "cheap" else self.generator
+                try:
+                    answer = generator.generate(question, context_chunks, timer=timer)
+                except GenerationError:
+                    # Keep the retrieved sources but flag the result so clients and the load test see the failure
+                    answer, failed = Generator.ERROR_ANSWER, True
 
-            return {
+            result = {
                 "question": question,
                 "context": context_chunks,
                 "scores": scores,
                 "metadata": metadatas,
                 "answer": answer,
-                "num_chunks": len(context_chunks)
+                "num_chunks": len(context_chunks),
+                "band": "error" if failed else band,
+                "timings": self._finish(timer, "error" if failed else band),
             }
+            if failed:
+                result["error"] = True
+            return result
 
         except Exception:
             logger.exception("Error in RAG pipeline")
@@ -82,5 +198,25 @@ class RAGPipeline:
                 "metadata": [],
                 "answer": "An error occurred while processing your question.",
                 "num_chunks": 0,
-                "error": True
+                "error": True,
+                "band": "error",
+                "timings": self._finish(timer, "error"),
             }
+
+    def _band(self, top_score: float) -> str:
+        """Confidence band for the best hybrid score: "abstain", "cheap" or "full"."""
+        if settings.ABSTAIN_SCORE_THRESHOLD is not None and top_score < settings.ABSTAIN_SCORE_THRESHOLD:
+            return "abstain"
+        if self.cheap_generator is not None and top_score < settings.CHEAP_SCORE_THRESHOLD:
+            return "cheap"
+        return "full"
+
+    @staticmethod
+    def _finish(timer: StageTimer, band: str) -> dict:
+        """Record end-to-end latency (overall and per band) and return the per-stage timings."""
+        QUERY_SECONDS.observe(timer.total_seconds())
+        BAND_QUERY_SECONDS.observe(timer.total_seconds(), band=band)
+        GENERATION_BANDS.inc(band=band)
+        timings = timer.as_dict()
+        logger.info("Query timings (ms): %s", timings, extra={"timings": timings})
+        return timings
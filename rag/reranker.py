@@ -0,0 +1,96 @@
+# project-rag-kaiser/rag/reranker.py
+"""
+Cross-encoder re-ranking under a latency budget.
+
+Scores (question, chunk) pairs with a small local cross-encoder
+(sentence-transformers CrossEncoder) in one batched forward pass and reorders
+the retriever's candidates by it. The pass runs on a worker thread; if it does
+not finish within RERANK_BUDGET_MS, or all workers are still busy with earlier
+passes, the current hybrid-score ordering is returned instead.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import RERANK_RESULTS, StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    def __init__(self, model_name: Optional[str] = None, max_candidates: Optional[int] = None,
+                 budget_ms: Optional[float] = None, workers: Optional[int] = None):
+        self.model_name = model_name or settings.RERANK_MODEL
+        self.max_candidates = max_candidates or settings.RERANK_MAX_CANDIDATES
+        self.budget_ms = settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        workers = workers or settings.RERANK_WORKERS
+        self.model = None
+        self._load_lock = threading.Lock()
+        # Passes that overran the budget keep their worker until they finish;
+        # the semaphore stops new requests from queueing behind them
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rerank")
+
+    def load(self):
+        """Load the cross-encoder (once)."""
+        with self._load_lock:
+            if self.model is None:
+                # Imported here so importing this module does not pull in torch
+                from sentence_transformers import CrossEncoder
+
+                self.model = CrossEncoder(self.model_name, max_length=settings.RERANK_MAX_LENGTH)
+                logger.info("Loaded re-ranker %s", self.model_name)
+        return self.model
+
+    def warm_up(self) -> None:
+        """Load the model and run one pass so the first request does not pay for it."""
+        self._slots.acquire()
+        self._score("warm up", ["warm up"])
+
+    def _score(self, question: str, texts: List[str]) -> List[float]:
+        # Called holding a slot; gives it back when the pass ends, even after a timeout
+        try:
+            model = self.load()
+            scores = model.predict([(question, text) for text in texts], batch_size=len(texts),
+                                   show_progress_bar=False)
+            return [float(s) for s in scores]
+        finally:
+            self._slots.release()
+
+    def rerank(self, question: str, retrieved: List[Tuple[str, float, dict]], top_k: int,
+               timer: Optional[StageTimer] = None) -> List[Tuple[str, float, dict]]:
+        """
+        Reorder the first ``max_candidates`` of ``retrieved`` (text, score,
+        metadata) by cross-encoder score and return the best ``top_k``; when
+        ``top_k`` exceeds ``max_candidates`` the rest follow in retrieval
+        order. Hybrid scores are kept in the tuples, so score thresholds keep
+        their meaning.
+        """
+        candidates, tail = retrieved[:self.max_candidates], retrieved[self.max_candidates:]
+        if len(candidates) <= 1:
+            return retrieved[:top_k]
+        timer = timer or StageTimer()
+        with timer.stage("rerank"):
+            if not self._slots.acquire(blocking=False):
+                RERANK_RESULTS.inc(result="busy")
+                return retrieved[:top_k]
+            try:
+                future = self._executor.submit(self._score, question, [text for text, _, _ in candidates])
+            except Exception:
+                self._slots.release()
+                raise
+            try:
+                scores = future.result(timeout=self.budget_ms / 1000.0)
+            except FutureTimeout:
+                RERANK_RESULTS.inc(result="timeout")
+                logger.warning("Re-ranking exceeded %.0f ms budget; keeping retrieval order", self.budget_ms)
+                return retrieved[:top_k]
+            except Exception:
+                RERANK_RESULTS.inc(result="error")
+                logger.exception("Re-ranking failed; keeping retrieval order")
+                return retrieved[:top_k]
+        RERANK_RESULTS.inc(result="reranked")
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return ([candidates[i] for i in order] + tail)[:top_k]
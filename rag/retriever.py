@@ -1,9 +1,18 @@
 # project-rag-kaiser/rag/retriever.py
 import logging
 import re
-from typing import List, Tuple, Optional
+import threading
+import time
+from typing import Any, Dict, List, Tuple, Optional
 import os
 
+from app.core.config import settings
+from app.core.metrics import QUERY_STAGE_SECONDS, RETRIEVAL_CANDIDATES, StageTimer
+from app.ingestion.regions import region_from_text
+from app.ingestion.snapshots import SnapshotManager
+from app.ingestion.text_store import TextStore, public_metadata
+from rag.quantized_index import QuantizedIndex
+
 try:
     from chromadb import PersistentClient
 except Exception:
@@ -13,28 +22,125 @@ logger = logging.getLogger(__name__)
 
 
 class Retriever:
-    """Query the Chroma vector store for relevant chunks with metadata-enhanced retrieval."""
+    """
+    Query the Chroma vector store for relevant chunks with metadata-enhanced retrieval.
+
+    Unless an explicit ``persist_dir`` is given, the retriever serves the active
+    index snapshot (see app.ingestion.snapshots) and hot-swaps to a newer one,
+    opened and warmed in the background, when the snapshot pointer changes.
+
+    With QUANTIZED_INDEX enabled and an index built for the persist dir (see
+    rag.quantized_index), unfiltered candidate generation scans int8 codes and
+    re-ranks with full-precision vectors instead of querying Chroma's HNSW index.
+    Filtered queries then scan only the rows in the index's posting lists.
 
-    def __init__(self, persist_dir: Optional[str] = None, collection_name: Optional[str] = None):
+    Chunk text kept out of line (app.ingestion.text_store) is read only for the
+    final top-k; candidates are fetched with vectors' metadata alone.
+    """
+
+    def __init__(self, persist_dir: Optional[str] = None, collection_name: Optional[str] = None,
+                 candidate_multiplier: Optional[int] = None, max_candidates: Optional[int] = None,
+                 quantized: Optional[bool] = None, quantized_overfetch: Optional[int] = None):
         self.persist_dir = persist_dir or os.getenv("CHROMA_PERSIST_DIR", "data/embeddings/chroma")
         self.collection_name = collection_name or os.getenv("CHROMA_COLLECTION", "project_rag")
+        self.candidate_multiplier = candidate_multiplier or settings.RETRIEVAL_CANDIDATE_MULTIPLIER
+        self.max_candidates = max_candidates or settings.RETRIEVAL_MAX_CANDIDATES
+        self.use_quantized = settings.QUANTIZED_INDEX if quantized is None else quantized
+        self.quantized_overfetch = quantized_overfetch or settings.QUANTIZED_OVERFETCH
         self.enabled = False
         self.collection = None
+        self.quantized: Optional[QuantizedIndex] = None
+        self.text_store: Optional[TextStore] = None
+        self.snapshot_version: Optional[str] = None
+        self.snapshots = SnapshotManager() if persist_dir is None else None
+        self._pointer_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self._reload_lock = threading.Lock()
 
         if PersistentClient is None:
             logger.warning("chromadb not installed — Retriever disabled")
             return
 
+        snapshot = self.snapshots.current() if self.snapshots else None
+        if snapshot:
+            self.persist_dir = snapshot["path"]
+            self.snapshot_version = snapshot["version"]
+            self._pointer_mtime = self.snapshots.pointer_mtime()
+
         try:
             self.client = PersistentClient(path=self.persist_dir)
-            self.collection = self.client.get_or_create_collection(name=self.collection_name)
+            self.collection = self._open_collection(self.client, create=True)
+            self.quantized = self._load_quantized(self.persist_dir, self.collection)
+            self.text_store = TextStore(self.persist_dir)
             self.enabled = True
-            logger.info("Retriever initialized (collection=%s)", self.collection_name)
+            logger.info("Retriever initialized (collection=%s, snapshot=%s, quantized=%s)",
+                        self.collection_name, self.snapshot_version or "none", self.quantized is not None)
         except Exception:
             logger.exception("Failed to initialize Retriever")
             self.enabled = False
 
-    def retrieve(self, query_embedding: List[float], query_text: str = "", top_k: int = 5) -> List[Tuple[str, float, dict]]:
+    def _open_collection(self, client, create: bool = False):
+        if create:
+            return client.get_or_create_collection(name=self.collection_name)
+        return client.get_collection(name=self.collection_name)
+
+    @staticmethod
+    def _warm(collection) -> None:
+        sample = collection.get(limit=1, include=["embeddings"])
+        if sample.get("ids"):
+            collection.query(query_embeddings=[list(sample["embeddings"][0])], n_results=1)
+
+    def _load_quantized(self, persist_dir: str, collection) -> Optional[QuantizedIndex]:
+        if not self.use_quantized:
+            return None
+        index = QuantizedIndex.load(persist_dir, self.collection_name, count=collection.count())
+        if index is None:
+            logger.warning("QUANTIZED_INDEX is set but %s has no quantized index; using Chroma", persist_dir)
+        return index
+
+    def _maybe_reload(self) -> None:
+        """Cheaply check the snapshot pointer and start a background swap if it moved."""
+        if self.snapshots is None:
+            return
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + settings.INDEX_RELOAD_INTERVAL_S
+        mtime = self.snapshots.pointer_mtime()
+        if mtime is None or mtime == self._pointer_mtime:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return  # a swap is already in progress
+        threading.Thread(target=self._reload, args=(mtime,), name="retriever-reload", daemon=True).start()
+
+    def _reload(self, mtime: float) -> None:
+        try:
+            snapshot = self.snapshots.current()
+            if not snapshot or snapshot["version"] == self.snapshot_version:
+                self._pointer_mtime = mtime
+                return
+            client = PersistentClient(path=snapshot["path"])
+            collection = self._open_collection(client)
+            # Warm the new index (segment load, HNSW pages) before taking traffic
+            self._warm(collection)
+            quantized = self._load_quantized(snapshot["path"], collection)
+            text_store = TextStore(snapshot["path"])
+            # Attribute assignment is atomic; in-flight queries keep the old collection
+            self.client, self.collection, self.quantized, self.text_store = client, collection, quantized, text_store
+            self.persist_dir = snapshot["path"]
+            self.snapshot_version = snapshot["version"]
+            self.enabled = True
+            self._pointer_mtime = mtime
+            logger.info("Retriever switched to index snapshot %s", snapshot["version"])
+        except Exception:
+            logger.exception("Failed to load index snapshot; still serving %s", self.snapshot_version)
+            self._pointer_mtime = mtime
+        finally:
+            self._reload_lock.release()
+
+    def retrieve(self, query_embedding: List[float], query_text: str = "", top_k: int = 5,
+                 timer: Optional[StageTimer] = None,
+                 filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, dict]]:
         """
         Retrieve top-k most relevant chunks using hybrid search.
         
@@ -42,53 +148,70 @@ class Retriever:
             query_embedding: Vector embedding of the query
             query_text: Original query text for metadata extraction
             top_k: Number of results to return
+            timer: Optional per-request timer; records "retrieve", "rescore" and "texts" stages
+            filters: Explicit metadata filters, {field: value or [values]}; they
+                override filters detected in the query text
             
         Returns:
             List of (text, score, metadata) tuples, sorted by relevance
         """
-        if not self.enabled or self.collection is None:
+        self._maybe_reload()
+        collection, quantized, text_store = self.collection, self.quantized, self.text_store
+        if not self.enabled or collection is None:
             logger.warning("Retriever disabled — returning empty results")
             return []
 
+        timer = timer or StageTimer(QUERY_STAGE_SECONDS)
         try:
-            # Extract metadata filters from query
-            metadata_filter = self._extract_metadata_filter(query_text)
+            # Extract metadata filters from query; explicit filters take precedence
+            detected = self._extract_metadata_filter(query_text) or {}
+            where = self.build_where({**detected, **(filters or {})})
             
-            # Retrieve more candidates for reranking (2x top_k)
-            n_results = min(top_k * 2, 50)
+            # Retrieve more candidates for reranking (2x top_k by default)
+            n_results = min(top_k * self.candidate_multiplier, self.max_candidates)
             
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                include=["documents", "distances", "metadatas"],
-                where=metadata_filter if metadata_filter else None
-            )
+            # Legacy collections keep chunk text in Chroma; fetch it with the candidates
+            with_documents = not text_store.path.exists()
 
-            if not results or not results.get("documents") or len(results["documents"]) == 0:
+            with timer.stage("retrieve"):
+                ids, documents, distances, metadatas = self._query_candidates(
+                    collection, quantized, query_embedding, n_results, where, with_documents)
+                if not ids and detected:
+                    # Filters read from the question are guesses; retry with the explicit ones only
+                    ids, documents, distances, metadatas = self._query_candidates(
+                        collection, quantized, query_embedding, n_results, self.build_where(filters),
+                        with_documents)
+
+            if not ids:
                 logger.info("No results found for query")
                 return []
 
-            documents = results["documents"][0]
-            distances = results["distances"][0]
-            metadatas = results["metadatas"][0]
-
-            # Hybrid scoring: semantic + metadata bonus
-            retrieved = []
-            for doc, dist, meta in zip(documents, distances, metadatas):
-                # Base semantic similarity (cosine)
-                semantic_score = 1 - dist
-                
-                # Metadata bonus
-                metadata_bonus = self._calculate_metadata_bonus(query_text, meta)
-                
-                # Hybrid score (70% semantic, 30% metadata)
-                hybrid_score = 0.7 * semantic_score + 0.3 * metadata_bonus
-                
-                retrieved.append((doc, hybrid_score, meta))
-
-            # Sort by hybrid score and return top-k
-            retrieved.sort(key=lambda x: x[1], reverse=True)
-            retrieved = retrieved[:top_k]
+            RETRIEVAL_CANDIDATES.observe(len(ids))
+
+            with timer.stage("rescore"):
+                # Hybrid scoring: semantic + metadata bonus
+                query_region = region_from_text(query_text)
+                retrieved = []
+                for chunk_id, doc, dist, meta in zip(ids, documents, distances, metadatas):
+                    # Base semantic similarity (cosine)
+                    semantic_score = 1 - dist
+
+                    # Metadata bonus
+                    metadata_bonus = self._calculate_metadata_bonus(query_text, meta, query_region)
+
+                    # Hybrid score (70% semantic, 30% metadata)
+                    hybrid_score = 0.7 * semantic_score + 0.3 * metadata_bonus
+
+                    retrieved.append((chunk_id, doc, hybrid_score, meta))
+
+                # Sort by hybrid score and return top-k
+                retrieved.sort(key=lambda x: x[2], reverse=True)
+                retrieved = retrieved[:top_k]
+
+            with timer.stage("texts"):
+                texts = self._fetch_texts(collection, text_store, retrieved)
+                retrieved = [(text, score, public_metadata(meta))
+                             for text, (_, _, score, meta) in zip(texts, retrieved)]
 
             if retrieved:
                 logger.info("Retrieved %d documents (top score: %.3f)", len(retrieved), retrieved[0][1])
@@ -97,23 +220,90 @@ class Retriever:
         except Exception:
             logger.exception("Error retrieving documents from Chroma")
             return []
+
+    def _query_candidates(self, collection, quantized: Optional[QuantizedIndex], query_embedding: List[float],
+                          n_results: int, where: Optional[dict], with_documents: bool = True):
+        """
+        Fetch the nearest ``n_results`` chunks as (ids, documents, distances,
+        metadatas). Documents are None unless ``with_documents`` is set.
+        """
+        include = ["documents", "metadatas"] if with_documents else ["metadatas"]
+        subset = quantized.rows_for(where) if quantized is not None and where else None
+        if quantized is None or (where and subset is None):
+            # Filters the posting lists cannot answer go to Chroma, which applies them in the HNSW search
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=include + ["distances"],
+                where=where if where else None
+            )
+            if not results or not results.get("ids") or not results["ids"][0]:
+                return [], [], [], []
+            ids = results["ids"][0]
+            documents = results["documents"][0] if with_documents else [None] * len(ids)
+            return ids, documents, results["distances"][0], results["metadatas"][0]
+
+        ids, distances = quantized.search(query_embedding, n_results, self.quantized_overfetch, subset)
+        if not ids:
+            return [], [], [], []
+        page = collection.get(ids=ids, include=include)
+        documents = page["documents"] if with_documents else [None] * len(page["ids"])
+        rows = {i: (doc, meta) for i, doc, meta in zip(page["ids"], documents, page["metadatas"])}
+        # Chunks deleted since the index was built are skipped
+        hits = [(i, rows[i], dist) for i, dist in zip(ids, distances) if i in rows]
+        return ([h[0] for h in hits], [h[1][0] for h in hits], [h[2] for h in hits],
+                [h[1][1] for h in hits])
+
+    @staticmethod
+    def _fetch_texts(collection, text_store: TextStore, retrieved) -> List[str]:
+        """Texts for the final (id, document, score, metadata) rows: from the text store, else Chroma."""
+        texts, missing = [], {}
+        for n, (chunk_id, doc, _, meta) in enumerate(retrieved):
+            if doc is None and meta.get("text_offset") is not None:
+                doc = text_store.read(meta)
+            if doc is None:
+                missing[chunk_id] = n
+            texts.append(doc)
+        if missing:
+            page = collection.get(ids=list(missing), include=["documents"])
+            for chunk_id, doc in zip(page["ids"], page["documents"]):
+                texts[missing[chunk_id]] = doc
+        return [text or "" for text in texts]
     
     def _extract_metadata_filter(self, query: str) -> Optional[dict]:
         """Extract metadata filters from query text."""
-        # Look for chapter mentions
+        conditions = {}
+        # Look for chapter mentions, else page mentions
         match = re.search(r'[Cc]hapter\s+(\d+)', query)
         if match:
-            return {"chapter": match.group(1)}
-        
-        # Look for page mentions
-        match = re.search(r'[Pp]age\s+(\d+)', query)
-        if match:
-            return {"page": int(match.group(1))}
-        
-        return None
+            conditions["chapter"] = match.group(1)
+        else:
+            match = re.search(r'[Pp]age\s+(\d+)', query)
+            if match:
+                conditions["page"] = int(match.group(1))
+
+        return conditions or None
+
+    @staticmethod
+    def build_where(conditions: Optional[Dict[str, Any]]) -> Optional[dict]:
+        """
+        Turn {field: value or [values]} into a Chroma where clause: lists become
+        ``$in`` and several fields are combined with ``$and``.
+        """
+        clauses = []
+        for field, value in (conditions or {}).items():
+            # Stored types: page is an int, everything else a string
+            cast = int if field == "page" else str
+            values = [cast(v) for v in value] if isinstance(value, (list, tuple, set)) else [cast(value)]
+            if not values:
+                continue
+            clauses.append({field: values[0]} if len(values) == 1 else {field: {"$in": values}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
     
-    def _calculate_metadata_bonus(self, query: str, metadata: dict) -> float:
-        """Calculate metadata match bonus (0.0 to 1.0)."""
+    def _calculate_metadata_bonus(self, query: str, metadata: dict, query_region: Optional[str] = None) -> float:
+        """Calculate metadata match bonus (0.0 to 1.0); ``query_region`` is region_from_text(query)."""
         bonus = 0.0
         query_lower = query.lower()
         
@@ -138,5 +328,10 @@ class Retriever:
             page_num = metadata["page"]
             if f"page {page_num}" in query_lower or f"page{page_num}" in query_lower:
                 bonus += 0.2
+
+        # Region match bonus; a place name is only a hint ("George Washington
+        # University Hospital"), so it ranks rather than filters
+        if metadata.get("region") and metadata["region"] == query_region:
+            bonus += 0.2
         
         return min(bonus, 1.0)  # Cap at 1.0
@@ -0,0 +1,100 @@
+# project-rag-kaiser/rag/sharded_retriever.py
+"""
+Retrieval over a sharded index (see app.ingestion.sharded_client).
+
+Every shard collection is queried for the full candidate depth concurrently on
+a bounded thread pool; each returns its candidates sorted by distance, so a
+heap merge of the partial lists gives exactly the global nearest candidates.
+Hybrid rescoring, text fetching and snapshot reloads are Retriever's, applied
+once to the merged set.
+"""
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Optional
+
+from app.core.config import settings
+from app.ingestion.sharded_client import shard_collection_names, shard_layout
+from rag.quantized_index import QuantizedIndex
+from rag.retriever import Retriever
+
+logger = logging.getLogger(__name__)
+
+
+class ShardSet:
+    """The shard collections of one index, with the parts of the collection API Retriever uses outside queries."""
+
+    def __init__(self, collections: list):
+        self.collections = collections
+
+    def __len__(self) -> int:
+        return len(self.collections)
+
+    def __iter__(self):
+        return iter(self.collections)
+
+    def count(self) -> int:
+        return sum(collection.count() for collection in self.collections)
+
+    def get(self, ids: List[str], include: List[str]) -> dict:
+        """Rows for ``ids`` from whichever shards hold them."""
+        merged = {"ids": []}
+        merged.update({field: [] for field in include})
+        for collection in self.collections:
+            page = collection.get(ids=ids, include=include)
+            merged["ids"].extend(page["ids"])
+            for field in include:
+                merged[field].extend(page[field])
+        return merged
+
+
+class ShardedRetriever(Retriever):
+    def __init__(self, persist_dir: Optional[str] = None, collection_name: Optional[str] = None,
+                 shards: Optional[int] = None, workers: Optional[int] = None, **kwargs):
+        self.shards = shards or settings.CHROMA_SHARDS
+        workers = min(self.shards, workers or settings.SHARD_QUERY_WORKERS)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shard-query")
+        # The quantized index covers a single collection
+        super().__init__(persist_dir=persist_dir, collection_name=collection_name, quantized=False, **kwargs)
+
+    def _open_collection(self, client, create: bool = False) -> ShardSet:
+        # Never create shards here: an index built with another layout (e.g. an
+        # unsharded snapshot) would otherwise be served as empty shards
+        names = shard_collection_names(self.collection_name, self.shards)
+        found = shard_layout(client, self.collection_name)
+        if found != names:
+            logger.error("Shard layout mismatch: CHROMA_SHARDS=%d expects %s_shard00..%02d, the index has %s",
+                         self.shards, self.collection_name, self.shards - 1, found or "no shard collections")
+            raise RuntimeError(f"Index has {len(found)} shard collection(s) of {self.collection_name!r}, "
+                               f"expected {self.shards}")
+        return ShardSet([client.get_collection(name=name) for name in names])
+
+    @staticmethod
+    def _warm(shard_set: ShardSet) -> None:
+        for collection in shard_set:
+            Retriever._warm(collection)
+
+    def _query_candidates(self, shard_set: ShardSet, quantized: Optional[QuantizedIndex],
+                          query_embedding: List[float], n_results: int, where: Optional[dict],
+                          with_documents: bool = True):
+        """Fan the candidate query out to every shard and merge the results by distance."""
+        query_shard = super()._query_candidates
+        futures = [self._executor.submit(query_shard, collection, None, query_embedding, n_results, where,
+                                         with_documents)
+                   for collection in shard_set]
+        partials = []
+        for collection, future in zip(shard_set, futures):
+            try:
+                ids, documents, distances, metadatas = future.result()
+            except Exception:
+                # One bad shard should not blank the answer; serve what the others found
+                logger.exception("Query on shard %s failed; merging the remaining shards", collection.name)
+                continue
+            partials.append(zip(distances, ids, documents, metadatas))
+
+        merged = list(islice(heapq.merge(*partials, key=lambda row: row[0]), n_results))
+        if not merged:
+            return [], [], [], []
+        distances, ids, documents, metadatas = (list(column) for column in zip(*merged))
+        return ids, documents, distances, metadatas
@@ -0,0 +1,134 @@
+# project-rag-kaiser/scripts/bench_prefork_rss.py
+"""
+Memory vs worker count: pre-fork (python -m app.prefork) vs uvicorn --workers.
+
+For each worker count the server is started, waited on until ready and
+queried once per worker, then RSS and PSS are summed over the whole process
+tree from /proc/<pid>/smaps_rollup (Linux only). PSS splits shared pages
+between the processes mapping them, so it is the number that shows
+copy-on-write sharing; RSS counts shared pages once per process.
+
+    python ./scripts/bench_prefork_rss.py --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+project_root = Path(__file__).parent.parent.resolve()
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--modes", nargs="+", choices=["prefork", "uvicorn"], default=["prefork", "uvicorn"])
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for readiness")
+    p.add_argument("--output", "-o", type=Path, help="Write the JSON results to this file")
+    return p.parse_args()
+
+
+def _children(pid: int):
+    kids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # Field 4 is the parent pid; split after the parenthesised command name
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        if ppid == pid:
+            kids.append(int(entry.name))
+    return kids
+
+
+def _tree(pid: int):
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(_children(current))
+    return pids
+
+
+def _rollup(pid: int):
+    values = {}
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            parts = line.split()
+            if len(parts) >= 3 and parts[0] in ("Rss:", "Pss:"):
+                values[parts[0][:-1].lower()] = int(parts[1]) / 1024.0
+    except OSError:
+        pass
+    return values
+
+
+def _command(mode: str, workers: int, port: int):
+    if mode == "prefork":
+        return [sys.executable, "-m", "app.prefork", "--workers", str(workers), "--port", str(port),
+                "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--workers", str(workers), "--port", str(port),
+            "--log-level", "warning"]
+
+
+def measure(mode: str, workers: int, port: int, timeout: float):
+    proc = subprocess.Popen(_command(mode, workers, port), cwd=project_root,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = time.time() + timeout
+        ready_hits = 0
+        # Each worker warms up independently; wait until several probes in a row succeed
+        while time.time() < deadline and ready_hits < workers * 3:
+            try:
+                ready_hits = ready_hits + 1 if requests.get(f"{base}/v1/health/ready", timeout=2).ok else 0
+            except requests.RequestException:
+                ready_hits = 0
+            time.sleep(0.2)
+        if ready_hits < workers * 3:
+            raise RuntimeError(f"{mode} with {workers} workers did not become ready in {timeout}s")
+        time.sleep(2)
+        pids = _tree(proc.pid)
+        rollups = [_rollup(pid) for pid in pids]
+        rss = sum(r.get("rss", 0.0) for r in rollups)
+        pss = sum(r.get("pss", 0.0) for r in rollups)
+        return {"mode": mode, "workers": workers, "processes": len(pids),
+                "rss_mb": round(rss, 1), "pss_mb": round(pss, 1),
+                "pss_per_worker_mb": round(pss / workers, 1)}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    args = parse_args()
+    if not Path("/proc/self/smaps_rollup").exists():
+        print("This benchmark needs Linux /proc/<pid>/smaps_rollup", file=sys.stderr)
+        return 2
+    env_note = os.getenv("LLM_BACKEND", "openai")
+    results = []
+    print(f"{'mode':<9}{'workers':>8}{'procs':>7}{'RSS MB':>10}{'PSS MB':>10}{'PSS/worker':>12}")
+    for mode in args.modes:
+        for workers in args.workers:
+            row = measure(mode, workers, args.port, args.timeout)
+            results.append(row)
+            print(f"{row['mode']:<9}{row['workers']:>8}{row['processes']:>7}{row['rss_mb']:>10.1f}"
+                  f"{row['pss_mb']:>10.1f}{row['pss_per_worker_mb']:>12.1f}")
+    if args.output:
+        args.output.write_text(json.dumps({"llm_backend": env_note, "results": results}, indent=2),
+                               encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
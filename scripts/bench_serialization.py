@@ -0,0 +1,76 @@
+# project-rag-kaiser/scripts/bench_serialization.py
+"""
+Serialization time and bytes on the wire for /v1/query response modes.
+
+Compares the previous path (QueryResponse validation + Pydantic JSON) with the
+projected dict encoded by stdlib json and by orjson, and reports raw and
+gzip-compressed sizes for each response_mode.
+
+    python ./scripts/bench_serialization.py --top_k 5 --chunk-chars 800
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.api.v1.schemas import QueryResponse  # noqa: E402
+from app.api.v1.serialization import RESPONSE_MODES, orjson, project_result  # noqa: E402
+from scripts.synthetic_corpus import generate_pages  # noqa: E402
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--top_k", type=int, default=5)
+    p.add_argument("--chunk-chars", type=int, default=800)
+    p.add_argument("--number", type=int, default=2000, help="Encodings per measurement")
+    return p.parse_args()
+
+
+def make_result(top_k: int, chunk_chars: int) -> dict:
+    text = "\n".join(t for _, t in generate_pages(top_k * 2))
+    rng = random.Random(0)
+    context = [text[i * chunk_chars:(i + 1) * chunk_chars] for i in range(top_k)]
+    return {
+        "question": "What does chapter 3 say about filing a claim in Washington?",
+        "answer": " ".join(context[0].split()[:120]),
+        "context": context,
+        "scores": [round(0.9 - 0.05 * i, 6) for i in range(top_k)],
+        "metadata": [{"source_file": "member-guide-wa-en.pdf", "page": rng.randint(1, 300),
+                      "chapter": str(rng.randint(1, 20)), "section": "Filing A Claim"} for _ in range(top_k)],
+        "num_chunks": top_k,
+        "timings": {"embed": 8.1, "retrieve": 4.2, "rescore": 0.1, "prompt": 0.02, "generate": 1500.0},
+    }
+
+
+def main():
+    args = parse_args()
+    result = make_result(args.top_k, args.chunk_chars)
+
+    def legacy():
+        return QueryResponse(**result).model_dump_json().encode("utf-8")
+
+    rows = [("legacy", "pydantic", legacy)]
+    for mode in RESPONSE_MODES:
+        rows.append((mode, "json", lambda m=mode: json.dumps(
+            project_result(result, m), separators=(",", ":")).encode("utf-8")))
+        if orjson is not None:
+            rows.append((mode, "orjson", lambda m=mode: orjson.dumps(project_result(result, m))))
+
+    print(f"top_k={args.top_k}, chunk_chars={args.chunk_chars}")
+    print(f"{'mode':<10}{'encoder':<10}{'us/resp':>10}{'bytes':>9}{'gzip':>8}")
+    for mode, encoder, fn in rows:
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+        payload = fn()
+        print(f"{mode:<10}{encoder:<10}{seconds * 1e6:>10.1f}{len(payload):>9}{len(gzip.compress(payload)):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
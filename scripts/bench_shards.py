@@ -0,0 +1,157 @@
+# project-rag-kaiser/scripts/bench_shards.py
+"""
+Retrieval latency vs shard count.
+
+Copies a collection's chunks (vectors, metadata, text) into scratch sharded
+indexes, one per shard count, and times Retriever.retrieve (1 shard) against
+ShardedRetriever (N shards) on the same queries:
+
+  - p50 / p95 latency of single queries
+  - throughput with --clients concurrent callers
+  - recall@k against exact brute-force top-k; the merge itself is exact, so
+    sharding only changes recall through the per-shard HNSW graphs
+
+    python ./scripts/bench_shards.py --shards 1 2 4 8 --k 5 --clients 8
+
+Without --persist-dir the active index snapshot is the source. Scratch indexes
+go to a temporary directory unless --work-dir is given.
+"""
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.ingestion.sharded_client import SHARD_KEYS, ShardedChromaClient  # noqa: E402
+from app.ingestion.text_store import public_metadata  # noqa: E402
+from rag.retriever import Retriever  # noqa: E402
+from rag.sharded_retriever import ShardedRetriever  # noqa: E402
+from scripts.eval_retrieval import evaluate, exact_topk, sample_queries  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+BENCH_COLLECTION = "bench_shards"
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--persist-dir", default=None, help="Source index (defaults to the active snapshot)")
+    p.add_argument("--collection", default=None)
+    p.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--shard-key", choices=SHARD_KEYS, default="chunk",
+                   help="How chunks are spread (chunk balances shards; source_file mirrors documents)")
+    p.add_argument("--workers", type=int, default=None, help="Shard query threads (default SHARD_QUERY_WORKERS)")
+    p.add_argument("--sample-queries", type=int, default=100)
+    p.add_argument("--noise", type=float, default=0.05, help="Noise added to sampled query vectors")
+    p.add_argument("--k", type=int, default=5, help="top_k to retrieve")
+    p.add_argument("--repeats", type=int, default=3, help="Timed passes per shard count")
+    p.add_argument("--clients", type=int, default=4, help="Concurrent callers for the throughput pass")
+    p.add_argument("--batch", type=int, default=5000, help="Chunks copied per page")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--work-dir", type=Path, help="Keep the sharded indexes here instead of a temp dir")
+    p.add_argument("--output", "-o", type=Path, help="Write the JSON report to this file")
+    return p.parse_args()
+
+
+def iter_chunks(source: Retriever, batch: int):
+    """Yield (embeddings, texts, metadatas) pages of the source collection."""
+    offset = 0
+    while True:
+        page = source.collection.get(include=["embeddings", "documents", "metadatas"], limit=batch, offset=offset)
+        if not page["ids"]:
+            return
+        texts = [doc if doc is not None else source.text_store.read(meta) or ""
+                 for doc, meta in zip(page["documents"], page["metadatas"])]
+        yield [list(v) for v in page["embeddings"]], texts, [public_metadata(m) for m in page["metadatas"]]
+        offset += len(page["ids"])
+
+
+def build_sharded(source: Retriever, path: Path, shards: int, shard_key: str, batch: int) -> list:
+    """Copy the source into ``shards`` collections under ``path``; returns the shard sizes."""
+    store = ShardedChromaClient(collection_name=BENCH_COLLECTION, persist_dir=str(path), shards=shards,
+                                shard_key=shard_key)
+    if not store.enabled:
+        raise RuntimeError("Chroma client disabled")
+    for embeddings, texts, metadatas in iter_chunks(source, batch):
+        store.insert(embeddings, texts, metadatas)
+    return [collection.count() for collection in store.collections]
+
+
+def throughput(retriever, queries, texts, k, clients) -> float:
+    def run(i):
+        retriever.retrieve(queries[i].tolist(), query_text=texts[i], top_k=k)
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        start = time.perf_counter()
+        list(pool.map(run, range(len(queries))))
+        return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("rag").setLevel(logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    source = Retriever(persist_dir=args.persist_dir, collection_name=args.collection, quantized=False)
+    if not source.enabled:
+        logger.error("Retriever disabled; nothing to benchmark")
+        return 1
+    logger.info("Source collection '%s' in %s holds %d chunks", source.collection_name, source.persist_dir,
+                source.collection.count())
+    queries, texts = sample_queries(source.collection, args.sample_queries, args.noise, args.seed, args.batch)
+    start = time.perf_counter()
+    truth = exact_topk(source.collection, queries, args.k, args.batch, source.text_store)
+    logger.info("Exact top-%d for %d queries computed in %.1fs", args.k, len(queries), time.perf_counter() - start)
+
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="bench-shards-"))
+    rows = []
+    try:
+        for shards in sorted(set(args.shards)):
+            path = work_dir / f"shards-{shards}"
+            shutil.rmtree(path, ignore_errors=True)
+            start = time.perf_counter()
+            sizes = build_sharded(source, path, shards, args.shard_key, args.batch)
+            logger.info("Built %d shard(s) in %.1fs: %s", shards, time.perf_counter() - start, sizes)
+
+            if shards == 1:
+                retriever = Retriever(persist_dir=str(path), collection_name=BENCH_COLLECTION, quantized=False)
+            else:
+                retriever = ShardedRetriever(persist_dir=str(path), collection_name=BENCH_COLLECTION,
+                                             shards=shards, workers=args.workers)
+            retriever.retrieve(queries[0].tolist(), query_text=texts[0], top_k=args.k)  # warm up
+            stats = evaluate(retriever, queries, texts, truth, args.k, args.repeats)
+            row = {"shards": shards, "chunks": sum(sizes), "largest_shard": max(sizes),
+                   "recall": stats["recall"], "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"],
+                   "qps": round(throughput(retriever, queries, texts, args.k, args.clients), 1)}
+            rows.append(row)
+            logger.info("%s", row)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\nk={args.k} over {len(queries)} queries, key={args.shard_key}, "
+          f"throughput with {args.clients} concurrent clients")
+    print(f"{'shards':>7}{'chunks':>9}{'largest':>9}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}{'qps':>9}")
+    for row in rows:
+        print(f"{row['shards']:>7}{row['chunks']:>9}{row['largest_shard']:>9}{row['recall']:>8.3f}"
+              f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['qps']:>9.1f}")
+
+    if args.output:
+        report = {"k": args.k, "queries": len(queries), "shard_key": args.shard_key, "clients": args.clients,
+                  "settings": rows}
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info("Report written to %s", args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
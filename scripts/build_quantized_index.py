@@ -0,0 +1,128 @@
+# project-rag-kaiser/scripts/build_quantized_index.py
+"""
+Build the int8 quantized candidate index for a Chroma collection and report
+its cost and recall impact.
+
+Builds (or, with --skip-build, reuses) <persist_dir>/quantized/, prints the
+bytes per vector the candidate scan keeps resident against the float32
+baseline, then compares Retriever.retrieve with and without the quantized
+index over a query set:
+
+  - overlap@k: share of the current (Chroma HNSW) top-k the quantized path returns
+  - recall@k / MRR against exact brute-force top-k, for both paths
+  - latency, per over-fetch factor
+
+    python ./scripts/build_quantized_index.py --k 5 --overfetch 1 2 4 8
+
+Without --persist-dir the active index snapshot is used. Set QUANTIZED_INDEX=true
+for the API to serve from the index.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from rag.quantized_index import QuantizedIndex  # noqa: E402
+from rag.retriever import Retriever  # noqa: E402
+from scripts.eval_retrieval import embed_questions, evaluate, exact_topk, sample_queries  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--persist-dir", default=None)
+    p.add_argument("--collection", default=None)
+    p.add_argument("--skip-build", action="store_true", help="Report on the existing index only")
+    p.add_argument("--questions", "-f", type=Path, help="File with one question per line")
+    p.add_argument("--sample-queries", type=int, default=100,
+                   help="Queries sampled from stored vectors when --questions is not given")
+    p.add_argument("--noise", type=float, default=0.05, help="Noise added to sampled query vectors")
+    p.add_argument("--k", type=int, default=5, help="top_k to evaluate")
+    p.add_argument("--overfetch", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--repeats", type=int, default=3, help="Timed passes per setting")
+    p.add_argument("--batch", type=int, default=5000, help="Vectors fetched per Chroma page")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", "-o", type=Path, help="Write the JSON report to this file")
+    return p.parse_args()
+
+
+def overlap(baseline, retriever, queries, texts, k):
+    """Mean share of each baseline top-k (by text) that ``retriever`` also returns."""
+    shares = []
+    for q, text, expected in zip(queries, texts, baseline):
+        got = {doc for doc, _, _ in retriever.retrieve(q.tolist(), query_text=text, top_k=k)}
+        shares.append(len(got & set(expected)) / max(1, len(set(expected))))
+    return round(float(np.mean(shares)), 4)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("rag").setLevel(logging.WARNING)
+
+    base = Retriever(persist_dir=args.persist_dir, collection_name=args.collection, quantized=False)
+    if not base.enabled:
+        logger.error("Retriever disabled; nothing to index")
+        return 1
+    collection = base.collection
+    logger.info("Collection '%s' in %s holds %d chunks", base.collection_name, base.persist_dir,
+                collection.count())
+
+    if args.skip_build:
+        index = QuantizedIndex.load(base.persist_dir, base.collection_name, count=collection.count())
+        if index is None:
+            logger.error("No usable quantized index in %s", base.persist_dir)
+            return 1
+    else:
+        index = QuantizedIndex.build(collection, base.persist_dir, batch=args.batch)
+    memory = index.memory_per_vector()
+    print(f"\nvectors: {len(index)}  dim: {index.dim}")
+    print(f"bytes/vector  float32: {memory['float32_bytes']}  scan (int8 + norm): "
+          f"{memory['scan_resident_bytes']}  ids: {memory['id_bytes']}  ({memory['compression']}x smaller)")
+
+    if args.questions:
+        queries, texts = embed_questions(args.questions)
+    else:
+        queries, texts = sample_queries(collection, args.sample_queries, args.noise, args.seed, args.batch)
+    start = time.perf_counter()
+    truth = exact_topk(collection, queries, args.k, args.batch, base.text_store)
+    logger.info("Exact top-%d for %d queries computed in %.1fs", args.k, len(queries), time.perf_counter() - start)
+
+    # The current serving path is the reference for overlap@k
+    current = [[doc for doc, _, _ in base.retrieve(q.tolist(), query_text=t, top_k=args.k)]
+               for q, t in zip(queries, texts)]
+    rows = [dict(path="chroma", overfetch=None, overlap=1.0,
+                 **evaluate(base, queries, texts, truth, args.k, args.repeats))]
+    for factor in args.overfetch:
+        retriever = Retriever(persist_dir=base.persist_dir, collection_name=base.collection_name,
+                              quantized=True, quantized_overfetch=factor)
+        row = dict(path="int8", overfetch=factor, overlap=overlap(current, retriever, queries, texts, args.k))
+        row.update(evaluate(retriever, queries, texts, truth, args.k, args.repeats))
+        rows.append(row)
+        logger.info("%s", row)
+
+    print(f"\nk={args.k} over {len(queries)} queries (overlap = share of current Retriever.retrieve top-k)")
+    print(f"{'path':<8}{'overfetch':>10}{'overlap':>9}{'recall':>9}{'mrr':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        print(f"{row['path']:<8}{row['overfetch'] or '-':>10}{row['overlap']:>9.3f}{row['recall']:>9.3f}"
+              f"{row['mrr']:>8.3f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}")
+
+    if args.output:
+        report = {"k": args.k, "queries": len(queries), "vectors": len(index), "dim": index.dim,
+                  "memory_per_vector": memory, "settings": rows}
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info("Report written to %s", args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
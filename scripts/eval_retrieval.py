@@ -0,0 +1,215 @@
+# project-rag-kaiser/scripts/eval_retrieval.py
+"""
+Retrieval recall-vs-latency evaluation.
+
+Computes exact brute-force top-k ground truth (cosine over every stored
+embedding, streamed from Chroma in batches) for a question set, then runs
+Retriever.retrieve across a sweep of candidate-depth settings and reports
+recall@k, MRR (reciprocal rank of the exact nearest neighbour) and latency,
+marking the Pareto-optimal settings.
+
+    python ./scripts/eval_retrieval.py --questions questions.txt --k 5 \\
+        --multipliers 1 2 4 8 --max-candidates 10 50 200
+
+Without --questions, stored chunk vectors (plus noise) are sampled as queries,
+which needs no embedding model.
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from rag.retriever import Retriever  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--questions", "-f", type=Path, help="File with one question per line")
+    p.add_argument("--sample-queries", type=int, default=100,
+                   help="Queries sampled from stored vectors when --questions is not given")
+    p.add_argument("--noise", type=float, default=0.05, help="Noise added to sampled query vectors")
+    p.add_argument("--k", type=int, default=5, help="top_k to evaluate")
+    p.add_argument("--multipliers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--max-candidates", type=int, nargs="+", default=[10, 50, 200])
+    p.add_argument("--repeats", type=int, default=3, help="Timed passes per setting")
+    p.add_argument("--batch", type=int, default=5000, help="Vectors fetched per Chroma page")
+    p.add_argument("--persist-dir", default=None)
+    p.add_argument("--collection", default=None)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", "-o", type=Path, help="Write the JSON report to this file")
+    return p.parse_args()
+
+
+def iter_stored(collection, batch: int, include=("embeddings", "documents"), text_store=None):
+    """
+    Yield (ids, documents, embeddings) pages without loading the collection at
+    once. Texts kept out of line are read from ``text_store``.
+    """
+    include = list(include)
+    if "documents" in include and text_store is not None:
+        include.append("metadatas")
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=batch, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        docs = page.get("documents")
+        if docs is not None and text_store is not None:
+            docs = [doc if doc is not None else text_store.read(meta or {})
+                    for doc, meta in zip(docs, page["metadatas"])]
+        yield ids, docs if docs is not None else [None] * len(ids), np.asarray(page["embeddings"], dtype=np.float32)
+        offset += len(ids)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def exact_topk(collection, queries: np.ndarray, k: int, batch: int, text_store=None):
+    """Brute-force cosine top-k per query, merged page by page. Returns lists of documents."""
+    queries = _normalize(queries)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_docs = np.empty((len(queries), 0), dtype=object)
+    for _, docs, vectors in iter_stored(collection, batch, text_store=text_store):
+        scores = queries @ _normalize(vectors).T
+        doc_arr = np.empty(len(docs), dtype=object)
+        doc_arr[:] = docs
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_docs = np.concatenate([best_docs, np.broadcast_to(doc_arr, scores.shape)], axis=1)
+        keep = min(k, merged_scores.shape[1])
+        idx = np.argpartition(-merged_scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(merged_scores, idx, axis=1)
+        best_docs = np.take_along_axis(merged_docs, idx, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return [list(row) for row in np.take_along_axis(best_docs, order, axis=1)]
+
+
+def sample_queries(collection, n: int, noise: float, seed: int, batch: int):
+    total = collection.count()
+    rng = np.random.default_rng(seed)
+    wanted = set(rng.choice(total, size=min(n, total), replace=False).tolist())
+    picked, offset = [], 0
+    for ids, _, vectors in iter_stored(collection, batch, include=("embeddings",)):
+        for i in range(len(ids)):
+            if offset + i in wanted:
+                picked.append(vectors[i])
+        offset += len(ids)
+    queries = np.asarray(picked, dtype=np.float32)
+    queries = queries + rng.normal(0.0, noise, queries.shape).astype(np.float32)
+    return _normalize(queries), [""] * len(queries)
+
+
+def embed_questions(path: Path):
+    from app.ingestion.embedder import Embedder
+
+    questions = [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    model = Embedder().model
+    return np.asarray([model.embed_query(q) for q in questions], dtype=np.float32), questions
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+def evaluate(retriever, queries, texts, truth, k, repeats):
+    recalls, rr, latencies = [], [], []
+    for rep in range(repeats):
+        for q, text, gt in zip(queries, texts, truth):
+            start = time.perf_counter()
+            results = retriever.retrieve(q.tolist(), query_text=text, top_k=k)
+            latencies.append(time.perf_counter() - start)
+            if rep:
+                continue
+            got = [doc for doc, _, _ in results]
+            # Matched on text, so identical duplicate chunks count as one hit
+            recalls.append(len(set(got) & set(gt)) / max(1, len(set(gt))))
+            rr.append(next((1.0 / (i + 1) for i, doc in enumerate(got) if gt and doc == gt[0]), 0.0))
+    return {
+        "recall": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(rr)), 4),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def mark_pareto(rows):
+    """Flag settings not dominated on (lower p50 latency, higher recall)."""
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row
+            and other["p50_ms"] <= row["p50_ms"] and other["recall"] >= row["recall"]
+            and (other["p50_ms"] < row["p50_ms"] or other["recall"] > row["recall"])
+            for other in rows
+        )
+    return rows
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("rag").setLevel(logging.WARNING)
+
+    base = Retriever(persist_dir=args.persist_dir, collection_name=args.collection)
+    if not base.enabled:
+        logger.error("Retriever disabled; nothing to evaluate")
+        return 1
+    collection = base.collection
+    logger.info("Collection '%s' holds %d chunks", base.collection_name, collection.count())
+
+    if args.questions:
+        queries, texts = embed_questions(args.questions)
+    else:
+        queries, texts = sample_queries(collection, args.sample_queries, args.noise, args.seed, args.batch)
+    logger.info("Computing exact top-%d ground truth for %d queries...", args.k, len(queries))
+    start = time.perf_counter()
+    truth = exact_topk(collection, queries, args.k, args.batch, base.text_store)
+    logger.info("Ground truth computed in %.1fs", time.perf_counter() - start)
+
+    rows, seen = [], set()
+    for mult in args.multipliers:
+        for cap in args.max_candidates:
+            depth = min(args.k * mult, cap)
+            if depth in seen:
+                continue  # same effective candidate depth as an earlier setting
+            seen.add(depth)
+            retriever = Retriever(persist_dir=base.persist_dir, collection_name=base.collection_name,
+                                  candidate_multiplier=mult, max_candidates=cap)
+            retriever.retrieve(queries[0].tolist(), query_text=texts[0], top_k=args.k)
+            row = {"multiplier": mult, "max_candidates": cap, "candidates": depth}
+            row.update(evaluate(retriever, queries, texts, truth, args.k, args.repeats))
+            rows.append(row)
+            logger.info("%s", row)
+
+    mark_pareto(rows)
+    print(f"\nrecall@{args.k} / MRR / latency over {len(queries)} queries "
+          f"(* = Pareto-optimal)")
+    print(f"{'mult':>5}{'max':>6}{'cands':>7}{'recall':>9}{'mrr':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in sorted(rows, key=lambda r: r["p50_ms"]):
+        print(f"{row['multiplier']:>5}{row['max_candidates']:>6}{row['candidates']:>7}"
+              f"{row['recall']:>9.3f}{row['mrr']:>8.3f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+              f"{'  *' if row['pareto'] else ''}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"k": args.k, "queries": len(queries), "settings": rows}, indent=2),
+                               encoding="utf-8")
+        logger.info("Report written to %s", args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,433 @@
+# project-rag-kaiser/scripts/index_maintenance.py
+"""
+Index maintenance: health report, duplicate removal and storage compaction.
+
+Scans a collection in pages of --batch chunks (texts are read one page at a
+time, never the whole collection) and finds
+
+  - exact duplicates: same normalised text (case/whitespace-insensitive)
+  - near duplicates (--near): SimHash over word 3-shingles within --near-bits
+    Hamming distance, found through band buckets instead of pairwise compares
+
+within the same source file (--scope source, default) or across the whole
+collection (--scope global). The first copy seen is kept. A sharded index
+(CHROMA_SHARDS, or --shards) is maintained as one: all shard collections are
+scanned together and texts.bin, which they share, is compacted against all of
+them.
+
+Without --apply this only prints the health report (sizes, per-source counts,
+duplicate ratios, estimated query-cost savings). With --apply the duplicates
+are deleted, texts.bin is rewritten without dead records, chroma.sqlite3 is
+VACUUMed and a quantized index (if present) is rebuilt.
+
+When the target is the active index snapshot, --apply works on a copy that is
+validated and then activated like a fresh ingestion build, so serving is never
+affected. --persist-dir / legacy directories are modified in place; stop
+servers using them first.
+
+    python ./scripts/index_maintenance.py                       # report (dry run)
+    python ./scripts/index_maintenance.py --near --apply        # dedupe + compact
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings  # noqa: E402
+from app.ingestion.sharded_client import shard_collection_names, shard_layout  # noqa: E402
+from app.ingestion.snapshots import SnapshotManager, SnapshotValidationError  # noqa: E402
+from app.ingestion.text_store import TEXT_FILE, TextStore  # noqa: E402
+from rag.quantized_index import QuantizedIndex, index_path  # noqa: E402
+
+try:
+    from chromadb import PersistentClient
+except Exception:
+    PersistentClient = None
+
+logger = logging.getLogger(__name__)
+
+# Chunks shorter than this (in words) are too small for meaningful near-duplicate matching
+MIN_NEAR_WORDS = 8
+# Entries kept per SimHash band bucket; bounds the compares for very common band values
+MAX_BUCKET = 256
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--persist-dir", default=None,
+                   help="Chroma directory to maintain in place (default: the active snapshot)")
+    p.add_argument("--collection", default=None, help="Collection name (the base name of a sharded index)")
+    p.add_argument("--shards", type=int, default=None,
+                   help="Shard collections of a sharded index (default: CHROMA_SHARDS, or as found on disk)")
+    p.add_argument("--batch", type=int, default=2000, help="Chunks read per page")
+    p.add_argument("--near", action="store_true", help="Also find near duplicates (SimHash)")
+    p.add_argument("--near-bits", type=int, default=5, help="Max Hamming distance for near duplicates")
+    p.add_argument("--scope", choices=["source", "global"], default="source",
+                   help="Compare chunks within each source file or across the collection")
+    p.add_argument("--apply", action="store_true", help="Delete duplicates and compact storage")
+    p.add_argument("--top-sources", type=int, default=10, help="Sources listed in the report")
+    p.add_argument("--output", "-o", type=Path, help="Write the JSON report to this file")
+    return p.parse_args()
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def simhash(words) -> int:
+    """64-bit SimHash of the word 3-shingles."""
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+                       for s in shingles], dtype=">u8")
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, 64)
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+class DuplicateFinder:
+    """Streaming exact + near duplicate detection; remembers only digests and signatures."""
+
+    def __init__(self, near: bool, near_bits: int):
+        self.near = near
+        self.near_bits = near_bits
+        self.exact = {}
+        # near_bits + 1 bands: two signatures within near_bits differ in at most
+        # near_bits bands, so they share at least one band exactly (pigeonhole)
+        n_bands = near_bits + 1
+        width = 64 // n_bands
+        self.bands = [(b * width, 64 - b * width if b == n_bands - 1 else width) for b in range(n_bands)]
+        self.buckets = {}
+
+    def check(self, chunk_id: str, text: str, scope: str):
+        """Return ("exact" | "near", kept_id) for a duplicate, else None (and remember the chunk)."""
+        normalized = _normalize(text)
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+        original = self.exact.get((scope, digest))
+        if original is not None:
+            return "exact", original
+        self.exact[(scope, digest)] = chunk_id
+        if not self.near:
+            return None
+        words = normalized.split()
+        if len(words) < MIN_NEAR_WORDS:
+            return None
+        signature = simhash(words)
+        keys = [(scope, b, (signature >> shift) & ((1 << width) - 1))
+                for b, (shift, width) in enumerate(self.bands)]
+        for key in keys:
+            for other_sig, other_id in self.buckets.get(key, ()):
+                if bin(signature ^ other_sig).count("1") <= self.near_bits:
+                    return "near", other_id
+        for key in keys:
+            bucket = self.buckets.setdefault(key, [])
+            if len(bucket) < MAX_BUCKET:
+                bucket.append((signature, chunk_id))
+        return None
+
+
+def iter_chunks(collection, text_store: TextStore, batch: int):
+    """Yield (ids, texts, metadatas) pages; texts come from the text store or Chroma documents."""
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=batch, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        metas = [meta or {} for meta in page["metadatas"]]
+        texts = [doc if doc is not None else (text_store.read(meta) or "")
+                 for doc, meta in zip(page["documents"], metas)]
+        yield ids, texts, metas
+        offset += len(ids)
+
+
+def scan(collections, text_store: TextStore, finder: DuplicateFinder, scope: str, batch: int) -> dict:
+    """Scan every collection of the index with one finder, so duplicates across shards are found too."""
+    per_source = Counter()
+    dup_per_source = Counter()
+    duplicates = {"exact": [], "near": []}
+    # Duplicate ids per collection, for deletion
+    owners = {collection.name: [] for collection in collections}
+    text_bytes = stored_text_bytes = 0
+    for collection in collections:
+        for ids, texts, metas in iter_chunks(collection, text_store, batch):
+            for chunk_id, text, meta in zip(ids, texts, metas):
+                source = meta.get("source_file", "unknown")
+                per_source[source] += 1
+                text_bytes += len(text.encode("utf-8"))
+                stored_text_bytes += meta.get("text_length", 0)
+                hit = finder.check(chunk_id, text, source if scope == "source" else "")
+                if hit is not None:
+                    duplicates[hit[0]].append(chunk_id)
+                    owners[collection.name].append(chunk_id)
+                    dup_per_source[source] += 1
+            logger.info("Scanned %d chunks", sum(per_source.values()))
+    return {
+        "owners": owners,
+        "chunks": sum(per_source.values()),
+        "per_source": per_source,
+        "dup_per_source": dup_per_source,
+        "duplicates": duplicates,
+        "text_bytes": text_bytes,
+        "stored_text_bytes": stored_text_bytes,
+    }
+
+
+def _dir_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) if path.exists() else 0
+
+
+def footprint(persist_dir: Path) -> dict:
+    """On-disk bytes by component."""
+    sqlite_bytes = sum(_dir_size(persist_dir / name) for name in
+                       ("chroma.sqlite3", "chroma.sqlite3-wal", "chroma.sqlite3-shm"))
+    text_bytes = _dir_size(persist_dir / TEXT_FILE)
+    quantized_bytes = _dir_size(index_path(str(persist_dir)))
+    total = _dir_size(persist_dir)
+    return {
+        "sqlite": sqlite_bytes,
+        "vector_segments": total - sqlite_bytes - text_bytes - quantized_bytes,
+        "text_store": text_bytes,
+        "quantized_index": quantized_bytes,
+        "total": total,
+    }
+
+
+def delete(collection, ids, batch: int) -> None:
+    for start in range(0, len(ids), batch):
+        collection.delete(ids=ids[start:start + batch])
+    logger.info("Deleted %d duplicate chunks", len(ids))
+
+
+def text_refs(client, batch: int):
+    """
+    Every collection in the directory (they may share texts.bin) and the text
+    records they reference, as (offset, length, collection name, chunk id).
+    """
+    collections = {c.name: client.get_collection(name=c.name) for c in client.list_collections()}
+    refs = []
+    for name, collection in collections.items():
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=batch, offset=offset)
+            if not page.get("ids"):
+                break
+            for chunk_id, meta in zip(page["ids"], page["metadatas"]):
+                if meta and meta.get("text_offset") is not None:
+                    refs.append((meta["text_offset"], meta["text_length"], name, chunk_id))
+            offset += len(page["ids"])
+    return collections, refs
+
+
+def compact_text_store(client, persist_dir: Path, batch: int) -> None:
+    """
+    Rewrite texts.bin with only the records still referenced, updating their
+    offsets. References are collected from every collection in the directory,
+    since shard collections share the file.
+    """
+    path = persist_dir / TEXT_FILE
+    if not path.exists():
+        return
+    collections, refs = text_refs(client, batch)
+    if sum(ref[1] for ref in refs) >= path.stat().st_size:
+        logger.info("%s has no unreferenced records", path)
+        return
+    refs.sort()  # sequential reads from the old file
+
+    tmp = path.with_name(f".{TEXT_FILE}.{os.getpid()}.tmp")
+    updates = {name: [] for name in collections}
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        for old_offset, length, name, chunk_id in refs:
+            src.seek(old_offset)
+            updates[name].append((chunk_id, {"text_offset": dst.tell()}))
+            dst.write(src.read(length))
+        dst.flush()
+        os.fsync(dst.fileno())
+    for name, pending in updates.items():
+        for start in range(0, len(pending), batch):
+            page = pending[start:start + batch]
+            collections[name].update(ids=[u[0] for u in page], metadatas=[u[1] for u in page])
+    before = path.stat().st_size
+    os.replace(tmp, path)
+    logger.info("Compacted %s: %d -> %d bytes", path, before, path.stat().st_size)
+
+
+def vacuum(persist_dir: Path) -> None:
+    """Reclaim free pages in Chroma's SQLite file."""
+    db = persist_dir / "chroma.sqlite3"
+    if not db.exists():
+        return
+    before = db.stat().st_size
+    try:
+        conn = sqlite3.connect(str(db), timeout=30)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        logger.exception("VACUUM of %s failed; the database is unchanged", db)
+        return
+    logger.info("VACUUM %s: %d -> %d bytes", db, before, db.stat().st_size)
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1e6:,.1f} MB"
+
+
+def print_report(report: dict, top_sources: int) -> None:
+    chunks = report["chunks"]
+    exact, near = report["exact_duplicates"], report["near_duplicates"]
+    shards = f" ({report['shards']} shards)" if report.get("shards", 1) > 1 else ""
+    print(f"\nCollection '{report['collection']}'{shards} in {report['persist_dir']}")
+    print(f"  chunks: {chunks:,}   exact duplicates: {exact:,}   near duplicates: {near:,}   "
+          f"duplicate ratio: {report['duplicate_ratio']:.1%}")
+    print(f"  chunk text: {_mb(report['text_bytes'])} raw"
+          + (f", {_mb(report['stored_text_bytes'])} stored" if report["stored_text_bytes"] else ""))
+    disk = report["footprint"]
+    print("  on disk: " + ", ".join(f"{k} {_mb(v)}" for k, v in disk.items())
+          + f"   ({disk['total'] / max(1, chunks):,.0f} bytes/chunk)")
+    if report.get("text_store_garbage"):
+        print(f"  text store: {_mb(report['text_store_garbage'])} unreferenced (reclaimed by compaction)")
+    print(f"\n  {'source':<48}{'chunks':>10}{'dups':>8}")
+    for source, count in report["per_source"][:top_sources]:
+        print(f"  {source[:47]:<48}{count:>10,}{report['dup_per_source'].get(source, 0):>8,}")
+    savings = report["savings"]
+    print(f"\n  estimated query-cost savings after dedupe ({chunks:,} -> {savings['chunks_after']:,} chunks):")
+    print(f"    linear scans (quantized / brute force): -{savings['scan']:.1%}")
+    print(f"    HNSW search (~log N):                   -{savings['hnsw']:.1%}")
+    print(f"    candidate slots spent on duplicates:     {report['duplicate_ratio']:.1%} (freed for distinct chunks)")
+
+
+def build_report(collection_name: str, persist_dir: Path, stats: dict, referenced_text_bytes: int) -> dict:
+    chunks = stats["chunks"]
+    removed = len(stats["duplicates"]["exact"]) + len(stats["duplicates"]["near"])
+    after = chunks - removed
+    disk = footprint(persist_dir)
+    garbage = max(0, disk["text_store"] - referenced_text_bytes) if disk["text_store"] else 0
+    return {
+        "collection": collection_name,
+        "persist_dir": str(persist_dir),
+        "chunks": chunks,
+        "exact_duplicates": len(stats["duplicates"]["exact"]),
+        "near_duplicates": len(stats["duplicates"]["near"]),
+        "duplicate_ratio": removed / max(1, chunks),
+        "text_bytes": stats["text_bytes"],
+        "stored_text_bytes": stats["stored_text_bytes"],
+        "text_store_garbage": garbage,
+        "footprint": disk,
+        "per_source": stats["per_source"].most_common(),
+        "dup_per_source": dict(stats["dup_per_source"]),
+        "savings": {
+            "chunks_after": after,
+            "scan": removed / max(1, chunks),
+            "hnsw": 1 - math.log(max(2, after)) / math.log(max(2, chunks)),
+        },
+    }
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if PersistentClient is None:
+        logger.error("chromadb not installed")
+        return 1
+
+    collection_name = args.collection or os.getenv("CHROMA_COLLECTION", "project_rag")
+    snapshots = snapshot = None
+    if args.persist_dir:
+        persist_dir = Path(args.persist_dir)
+    else:
+        snapshots = SnapshotManager()
+        snapshot = snapshots.current()
+        persist_dir = Path(snapshot["path"] if snapshot else os.getenv("CHROMA_PERSIST_DIR", "data/embeddings/chroma"))
+    if not persist_dir.exists():
+        logger.error("No index at %s", persist_dir)
+        return 1
+
+    if args.apply and snapshot:
+        # Blue/green: maintain a copy and activate it once it validates
+        target = snapshots.new_snapshot()
+        shutil.copytree(persist_dir, target, dirs_exist_ok=True)
+        logger.info("Maintaining a copy of snapshot %s in %s", snapshot["version"], target.name)
+    else:
+        target = persist_dir
+        if args.apply:
+            logger.warning("Modifying %s in place; stop servers using it first", target)
+
+    # A copied snapshot that was not activated is removed however maintenance ends
+    activated = False
+    try:
+        client = PersistentClient(path=str(target))
+        shards = args.shards or settings.CHROMA_SHARDS
+        found = shard_layout(client, collection_name)
+        plain = collection_name in {c.name for c in client.list_collections()}
+        if args.shards is None and shards == 1 and found and not plain:
+            logger.info("Found a sharded index: %d shard collections of '%s'", len(found), collection_name)
+            shards = len(found)
+        names = shard_collection_names(collection_name, shards)
+        if shards > 1 and found != names:
+            logger.error("Expected %d shard collections of '%s' in %s, found %s", shards, collection_name, target,
+                         found or "none")
+            return 1
+        collections = [client.get_collection(name=name) for name in names]
+        text_store = TextStore(str(target))
+        start = time.perf_counter()
+        finder = DuplicateFinder(args.near, args.near_bits)
+        stats = scan(collections, text_store, finder, args.scope, args.batch)
+        _, refs = text_refs(client, args.batch)
+        report = build_report(collection_name, target, stats, sum(ref[1] for ref in refs))
+        report["shards"] = shards
+        logger.info("Scan finished in %.1fs", time.perf_counter() - start)
+        print_report(report, args.top_sources)
+
+        if args.apply:
+            try:
+                for collection in collections:
+                    ids = stats["owners"][collection.name]
+                    if ids:
+                        delete(collection, ids, args.batch)
+                compact_text_store(client, target, args.batch)
+                if len(collections) == 1 and (index_path(str(target)) / "meta.json").exists():
+                    QuantizedIndex.build(collections[0], str(target))
+                del collections, client
+                vacuum(target)
+                if snapshot:
+                    count = snapshots.validate(target, collection_name,
+                                               min_chunks=report["savings"]["chunks_after"], shards=shards)
+                    snapshots.activate(target, collection_name, count)
+                    activated = True
+                    snapshots.gc()
+            except (SnapshotValidationError, RuntimeError):
+                logger.exception("Maintenance failed")
+                return 1
+            after = footprint(target)
+            print(f"\n  after maintenance: {', '.join(f'{k} {_mb(v)}' for k, v in after.items())}")
+            report["footprint_after"] = after
+
+        if args.output:
+            report["dup_per_source"] = dict(report["dup_per_source"])
+            args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            logger.info("Report written to %s", args.output)
+        return 0
+    finally:
+        if target != persist_dir and not activated:
+            shutil.rmtree(target, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
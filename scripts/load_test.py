@@ -0,0 +1,192 @@
+# project-rag-kaiser/scripts/load_test.py
+"""
+HTTP load test for the RAG API.
+
+Replays a question file against /v1/query with concurrent clients and reports
+throughput plus p50/p95/p99 latency end-to-end and per server stage (from the
+response ``timings`` block). Run the API with LLM_BACKEND=fake to capacity-plan
+retrieval and serving without network access or OpenAI quota:
+
+    LLM_BACKEND=fake uvicorn app.main:app
+    python ./scripts/load_test.py --questions questions.txt --concurrency 16 --requests 2000
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS = [
+    "What are the principles of responsibility?",
+    "How do I file a claim?",
+    "What is covered by Kaiser insurance?",
+    "What is in chapter 12?",
+    "How do I find a doctor in Washington?",
+]
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    p.add_argument("--questions", "-f", type=Path, help="File with one question per line (replayed in order)")
+    p.add_argument("--concurrency", "-c", type=int, default=8, help="Concurrent clients")
+    p.add_argument("--requests", "-n", type=int, default=200, help="Total requests to send")
+    p.add_argument("--duration", "-d", type=float, default=None,
+                   help="Stop after this many seconds (overrides --requests)")
+    p.add_argument("--warmup", type=int, default=5, help="Untimed requests sent before the run")
+    p.add_argument("--top_k", "-k", type=int, default=5, help="top_k sent with each query")
+    p.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    p.add_argument("--output", "-o", type=Path, help="Write the JSON report to this file")
+    return p.parse_args()
+
+
+def load_questions(path):
+    if path is None:
+        return DEFAULT_QUESTIONS
+    with path.open("r", encoding="utf-8") as fh:
+        questions = [line.strip() for line in fh if line.strip()]
+    if not questions:
+        raise ValueError(f"No questions found in {path}")
+    return questions
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+class LoadTest:
+    def __init__(self, url, questions, top_k, timeout):
+        self.endpoint = url.rstrip("/") + "/v1/query"
+        self.questions = itertools.cycle(questions)
+        self.top_k = top_k
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latencies_ms = []
+        self.stage_ms = defaultdict(list)
+        self.statuses = Counter()
+        self.bands = Counter()
+        self.pipeline_errors = 0
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _next_question(self):
+        with self._lock:
+            return next(self.questions)
+
+    def send(self, record=True):
+        payload = {"question": self._next_question(), "top_k": self.top_k, "include_timings": True}
+        start = time.perf_counter()
+        try:
+            resp = self._session().post(self.endpoint, json=payload, timeout=self.timeout)
+            status = str(resp.status_code)
+            body = resp.json() if resp.ok else {}
+        except requests.RequestException as e:
+            status, body = type(e).__name__, {}
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if not record:
+            return
+        with self._lock:
+            self.statuses[status] += 1
+            if status == "200":
+                self.latencies_ms.append(elapsed_ms)
+                if body.get("error"):
+                    self.pipeline_errors += 1
+                if body.get("band"):
+                    self.bands[body["band"]] += 1
+                for stage, ms in (body.get("timings") or {}).items():
+                    self.stage_ms[stage].append(ms)
+
+    def run(self, concurrency, total, duration):
+        deadline = time.perf_counter() + duration if duration else None
+        counter = itertools.count()
+
+        def worker():
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        return
+                elif next(counter) >= total:
+                    return
+                self.send()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as ex:
+            for _ in range(concurrency):
+                ex.submit(worker)
+        return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    test = LoadTest(args.url, load_questions(args.questions), args.top_k, args.timeout)
+
+    logger.info("Warming up with %d requests...", args.warmup)
+    for _ in range(args.warmup):
+        test.send(record=False)
+
+    logger.info("Running: concurrency=%d, %s", args.concurrency,
+                f"duration={args.duration}s" if args.duration else f"requests={args.requests}")
+    elapsed = test.run(args.concurrency, args.requests, args.duration)
+
+    sent = sum(test.statuses.values())
+    report = {
+        "url": test.endpoint,
+        "concurrency": args.concurrency,
+        "requests": sent,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(sent / elapsed, 2) if elapsed else None,
+        "statuses": dict(test.statuses),
+        "pipeline_errors": test.pipeline_errors,
+        "bands": dict(test.bands),
+        "latency_ms": summarize(test.latencies_ms),
+        "stage_latency_ms": {stage: summarize(values) for stage, values in sorted(test.stage_ms.items())},
+    }
+
+    print(f"\n{sent} requests in {elapsed:.1f}s -> {report['throughput_rps']} req/s  statuses={dict(test.statuses)}")
+    if test.bands:
+        print("confidence bands: " + ", ".join(f"{band}={n}" for band, n in sorted(test.bands.items())))
+    print(f"{'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    rows = [("client", report["latency_ms"])] + list(report["stage_latency_ms"].items())
+    for name, stats in rows:
+        if stats["count"]:
+            print(f"{name:<12}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info("Report written to %s", args.output)
+    return 0 if test.statuses.get("200") else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
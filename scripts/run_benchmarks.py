@@ -0,0 +1,275 @@
+# project-rag-kaiser/scripts/run_benchmarks.py
+"""
+Ingestion and retrieval micro-benchmarks.
+
+Stages:
+    pdf_extract  app.ingestion.doc_loader._extract_text_from_pdf_path on a synthetic PDF
+    chunk        MetadataChunker.chunk_with_metadata over the synthetic corpus
+    embed        Embedder.embed on a sample of chunks
+    insert       ChromaClient.insert into a scratch collection (random unit vectors)
+    retrieve     Retriever.retrieve against that collection
+
+Results are written to JSON. With --baseline, any stage whose throughput drops
+more than --threshold below the stored baseline fails the run (exit code 1), as
+does any stage that fails or any baseline stage that is not run.
+
+    python ./scripts/run_benchmarks.py --chunks 10000 --save-baseline
+    python ./scripts/run_benchmarks.py --chunks 10000            # compare against baseline
+"""
+import argparse
+import json
+import logging
+import math
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from scripts.synthetic_corpus import generate_pages, write_pdf  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["pdf_extract", "chunk", "embed", "insert", "retrieve"]
+DEFAULT_BASELINE = project_root / "scripts" / "bench_baseline.json"
+EMBED_DIM = 384
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--chunks", type=int, default=10000, help="Synthetic corpus size in chunks (10k to 2M)")
+    p.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    p.add_argument("--pdf-pages", type=int, default=200, help="Pages in the synthetic PDF for pdf_extract")
+    p.add_argument("--embed-sample", type=int, default=2000, help="Chunks embedded by the embed stage")
+    p.add_argument("--insert-batch", type=int, default=1000, help="Chunks per ChromaClient.insert call")
+    p.add_argument("--queries", type=int, default=200, help="Queries issued by the retrieve stage")
+    p.add_argument("--top_k", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", "-o", type=Path, default=Path("bench_results.json"))
+    p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    p.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    p.add_argument("--threshold", type=float, default=0.2,
+                   help="Allowed fractional throughput regression vs baseline (0.2 = 20%%)")
+    return p.parse_args()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+def _result(items, seconds, **extra):
+    out = {"items": items, "seconds": round(seconds, 4),
+           "items_per_sec": round(items / seconds, 2) if seconds > 0 else None}
+    out.update(extra)
+    return out
+
+
+def bench_pdf_extract(args, ctx):
+    from app.ingestion.doc_loader import _extract_text_from_pdf_path
+
+    path = write_pdf(Path(ctx["tmp"]) / "bench.pdf", generate_pages(args.pdf_pages * 4, seed=args.seed))
+    start = time.perf_counter()
+    extracted = _extract_text_from_pdf_path(path)
+    elapsed = time.perf_counter() - start
+    return _result(len(extracted), elapsed, unit="pages", bytes=path.stat().st_size)
+
+
+def bench_chunk(args, ctx):
+    from app.ingestion.metadata_chunker import MetadataChunker
+
+    chunker = MetadataChunker()
+    total, elapsed = 0, 0.0
+    batch = []
+    # Chunk in page batches so 2M-chunk corpora never sit in memory at once
+    for page in generate_pages(args.chunks, seed=args.seed):
+        batch.append(page)
+        if len(batch) >= 500:
+            start = time.perf_counter()
+            chunks = chunker.chunk_with_metadata(batch, "synthetic.pdf")
+            elapsed += time.perf_counter() - start
+            total += len(chunks)
+            ctx.setdefault("sample_chunks", [c for c, _ in chunks[: args.embed_sample]])
+            batch = []
+    if batch:
+        start = time.perf_counter()
+        chunks = chunker.chunk_with_metadata(batch, "synthetic.pdf")
+        elapsed += time.perf_counter() - start
+        total += len(chunks)
+        ctx.setdefault("sample_chunks", [c for c, _ in chunks[: args.embed_sample]])
+    return _result(total, elapsed, unit="chunks")
+
+
+def _sample_chunks(args, ctx):
+    if "sample_chunks" not in ctx:
+        from app.ingestion.metadata_chunker import MetadataChunker
+
+        pages = list(generate_pages(args.embed_sample, seed=args.seed))
+        ctx["sample_chunks"] = [c for c, _ in MetadataChunker().chunk_with_metadata(pages, "synthetic.pdf")]
+    return ctx["sample_chunks"][: args.embed_sample]
+
+
+def bench_embed(args, ctx):
+    from app.ingestion.embedder import Embedder
+
+    chunks = _sample_chunks(args, ctx)
+    embedder = Embedder()
+    embedder.embed(chunks[:8])  # model warm-up
+    start = time.perf_counter()
+    vectors = embedder.embed(chunks)
+    elapsed = time.perf_counter() - start
+    return _result(len(vectors), elapsed, unit="chunks")
+
+
+def _unit_vectors(rng, n):
+    import numpy as np
+
+    vecs = rng.standard_normal((n, EMBED_DIM)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
+
+
+def bench_insert(args, ctx):
+    import numpy as np
+    from app.ingestion.chroma_client import ChromaClient
+
+    persist_dir = str(Path(ctx["tmp"]) / "chroma")
+    store = ChromaClient(collection_name="bench", persist_dir=persist_dir)
+    if not store.enabled:
+        raise RuntimeError("Chroma client disabled")
+    rng = np.random.default_rng(args.seed)
+    sample = _sample_chunks(args, ctx)
+    total, elapsed = 0, 0.0
+    while total < args.chunks:
+        n = min(args.insert_batch, args.chunks - total)
+        vectors = _unit_vectors(rng, n).tolist()
+        texts = [sample[(total + i) % len(sample)] for i in range(n)]
+        metas = [{"source_file": "synthetic.pdf", "page": (total + i) // 4 + 1,
+                  "chapter": str((total + i) // 48 + 1), "section": ""} for i in range(n)]
+        start = time.perf_counter()
+        store.insert(vectors, texts, metas)
+        elapsed += time.perf_counter() - start
+        total += n
+    stored = store.collection.count()
+    if stored < total:
+        raise RuntimeError(f"Only {stored}/{total} chunks were stored")
+    ctx["persist_dir"] = persist_dir
+    return _result(total, elapsed, unit="chunks")
+
+
+def bench_retrieve(args, ctx):
+    import numpy as np
+    from rag.retriever import Retriever
+
+    if "persist_dir" not in ctx:
+        raise RuntimeError("retrieve requires the insert stage")
+    retriever = Retriever(persist_dir=ctx["persist_dir"], collection_name="bench")
+    rng = np.random.default_rng(args.seed + 1)
+    queries = _unit_vectors(rng, args.queries).tolist()
+    retriever.retrieve(queries[0], query_text="warm up", top_k=args.top_k)
+    latencies = []
+    for i, q in enumerate(queries):
+        text = f"What does chapter {i % 12 + 1} say about claims?" if i % 4 == 0 else "How do I file a claim?"
+        start = time.perf_counter()
+        retriever.retrieve(q, query_text=text, top_k=args.top_k)
+        latencies.append(time.perf_counter() - start)
+    elapsed = sum(latencies)
+    return _result(len(queries), elapsed, unit="queries",
+                   p50_ms=round(_percentile(latencies, 50) * 1000, 3),
+                   p95_ms=round(_percentile(latencies, 95) * 1000, 3),
+                   p99_ms=round(_percentile(latencies, 99) * 1000, 3))
+
+
+BENCHES = {
+    "pdf_extract": bench_pdf_extract,
+    "chunk": bench_chunk,
+    "embed": bench_embed,
+    "insert": bench_insert,
+    "retrieve": bench_retrieve,
+}
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions; a baseline stage that did not run counts as one."""
+    regressions = []
+    if baseline.get("chunks") != results["chunks"]:
+        logger.warning("Baseline was recorded at %s chunks, this run uses %s; comparison is approximate",
+                       baseline.get("chunks"), results["chunks"])
+    for stage, error in results["skipped"].items():
+        regressions.append(f"{stage}: failed ({error})")
+    for stage, base in baseline.get("stages", {}).items():
+        current = results["stages"].get(stage)
+        if stage in results["skipped"]:
+            continue
+        if current is None:
+            regressions.append(f"{stage}: in the baseline but not run")
+            continue
+        if base.get("items_per_sec") and not current.get("items_per_sec"):
+            regressions.append(f"{stage}: no throughput measured (baseline {base['items_per_sec']:.1f}/s)")
+            continue
+        if not base.get("items_per_sec"):
+            continue
+        ratio = current["items_per_sec"] / base["items_per_sec"]
+        if ratio < 1.0 - threshold:
+            regressions.append(f"{stage}: {current['items_per_sec']:.1f}/s vs baseline "
+                               f"{base['items_per_sec']:.1f}/s ({(1 - ratio) * 100:.0f}% slower)")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Per-call INFO lines from the components would dominate the timings
+    for name in ("rag", "app.ingestion"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    results = {
+        "chunks": args.chunks,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": {},
+        "skipped": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        ctx = {"tmp": tmp}
+        for stage in STAGES:
+            if stage not in args.stages:
+                continue
+            logger.info("Running %s ...", stage)
+            try:
+                results["stages"][stage] = BENCHES[stage](args, ctx)
+                logger.info("%s: %s", stage, results["stages"][stage])
+            except Exception as e:
+                logger.exception("Stage %s failed", stage)
+                results["skipped"][stage] = str(e)
+
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    logger.info("Results written to %s", args.output)
+
+    if args.save_baseline:
+        if results["skipped"]:
+            logger.error("Not saving a baseline: stage(s) %s failed", ", ".join(results["skipped"]))
+            return 1
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        logger.info("Baseline saved to %s", args.baseline)
+        return 0
+
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            for line in regressions:
+                logger.error("REGRESSION %s", line)
+            return 1
+        logger.info("No stage regressed more than %.0f%% vs %s", args.threshold * 100, args.baseline)
+    else:
+        logger.info("No baseline at %s; run with --save-baseline to create one", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
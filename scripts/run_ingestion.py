@@ -1,10 +1,20 @@
 # # project-rag-kaiser/scripts/run_ingestion.py
+import argparse
+import os
+import shutil
 import sys
 from pathlib import Path
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.ingestion.bulk_writer import BulkWriteError, BulkWriter
+from app.ingestion.chroma_client import ChromaClient
+from app.ingestion.sharded_client import ShardedChromaClient
 from app.ingestion.pipeline import IngestionPipeline
+from app.ingestion.snapshots import SnapshotManager, SnapshotValidationError
 from app.schemas.ingestion import IngestionDocument
+from app.core.metrics import INGEST_DOCUMENTS
+from app.core.config import settings
+from rag.quantized_index import INDEX_DIR as QUANTIZED_DIR, QuantizedIndex
 
 project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
@@ -15,25 +25,42 @@ if str(project_root) not in sys.path:
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
-def ingest_doc(pipeline, doc: IngestionDocument):
+def ingest_doc(pipeline, doc: IngestionDocument, profile: bool = False):
     logger.info("Ingesting %s ...", doc.file_path)
     try:
-        result = pipeline.ingest(doc)
+        result = pipeline.ingest(doc, profile=profile)
         logger.info("Ingested %s -> %s", doc.file_path, result)
         return result
     except Exception as e:
         logger.exception("Failed to ingest %s", doc.file_path)
+        INGEST_DOCUMENTS.inc(status="error")
         return {"file": doc.file_path, "status": "error", "error": str(e)}
 
-def main(parallel: int = 1):
-    pipeline = IngestionPipeline()
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--parallel", type=int, default=1, help="Number of documents to ingest concurrently")
+    p.add_argument("--profile", action="store_true",
+                   help="Write a cProfile (pstats) file per document to PROFILE_DIR")
+    p.add_argument("--in-place", action="store_true",
+                   help="Write into CHROMA_PERSIST_DIR instead of building a new blue/green snapshot "
+                        "(refused while a snapshot is active, since the API serves the snapshot)")
+    p.add_argument("--rebuild", action="store_true",
+                   help="Build the snapshot from the given documents only; by default the new snapshot starts "
+                        "as a copy of the active one, so the documents are added to it")
+    p.add_argument("paths", nargs="*", help="Documents to ingest (defaults to the Kaiser PDFs in data/kaiser)")
+    return p.parse_args()
 
-    doc_paths = [
-        "data/kaiser/principlesofresponsibility-en.pdf",
-        "data/kaiser/evidence-of-coverage-special-needs-eae-ncal.pdf",
-        "data/kaiser/member-guide-wa-en.pdf",
-        "data/kaiser/kp-1.pdf",
-    ]
+
+DEFAULT_DOC_PATHS = [
+    "data/kaiser/principlesofresponsibility-en.pdf",
+    "data/kaiser/evidence-of-coverage-special-needs-eae-ncal.pdf",
+    "data/kaiser/member-guide-wa-en.pdf",
+    "data/kaiser/kp-1.pdf",
+]
+
+
+def main(parallel: int = 1, profile: bool = False, in_place: bool = False, doc_paths=None, rebuild: bool = False):
+    doc_paths = doc_paths or DEFAULT_DOC_PATHS
 
     docs = []
     for p in doc_paths:
@@ -47,16 +74,77 @@ def main(parallel: int = 1):
         logger.error("No valid documents to ingest. Exiting.")
         return 1
 
+    snapshots = SnapshotManager()
+    active = snapshots.current()
+    if in_place:
+        if active:
+            logger.error("Snapshot %s is active and is what the API serves; --in-place would write to %s, "
+                         "which nothing reads. Drop --in-place to build a new snapshot.",
+                         active["version"], os.getenv("CHROMA_PERSIST_DIR", "data/embeddings/chroma"))
+            return 1
+        snapshots = None
+    snapshot_path = snapshots.new_snapshot() if snapshots else None
+    seeded = 0
+    if snapshot_path is not None and active and not rebuild:
+        # Add to what is served instead of replacing it with just these documents. The
+        # quantized index would go stale once chunks are added; it is rebuilt below
+        shutil.copytree(active["path"], snapshot_path, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(QUANTIZED_DIR, f".{QUANTIZED_DIR}.*.tmp"))
+        seeded = int(active.get("chunks", 0))
+        logger.info("New snapshot starts from %s (%d chunks); use --rebuild to start empty",
+                    active["version"], seeded)
+    persist_dir = str(snapshot_path) if snapshot_path else None
+    if settings.CHROMA_SHARDS > 1:
+        store = ShardedChromaClient(persist_dir=persist_dir)
+    else:
+        store = ChromaClient(persist_dir=persist_dir)
+    # One writer for the run: batches from all documents share it and it persists once at the end
+    writer = BulkWriter(store)
+    pipeline = IngestionPipeline(store=store, writer=writer)
+
+    results = []
     if parallel > 1:
         with ThreadPoolExecutor(max_workers=parallel) as ex:
-            futures = {ex.submit(ingest_doc, pipeline, d): d for d in docs}
+            futures = {ex.submit(ingest_doc, pipeline, d, profile): d for d in docs}
             for fut in as_completed(futures):
-                _ = fut.result()
+                results.append(fut.result())
     else:
         for d in docs:
-            ingest_doc(pipeline, d)
+            results.append(ingest_doc(pipeline, d, profile))
 
+    try:
+        writer.close()
+    except BulkWriteError:
+        logger.exception("Chunks could not be written to the vector store")
+        if snapshot_path is not None:
+            logger.error("Snapshot %s rejected; the active index is unchanged", snapshot_path.name)
+            shutil.rmtree(snapshot_path, ignore_errors=True)
+        return 1
+
+    if snapshots is None:
+        return 0
+
+    # Blue/green: only flip the pointer once the new snapshot checks out
+    expected = seeded + sum(r.get("stored", 0) for r in results if r.get("status") == "success")
+    failed = [r for r in results if r.get("status") != "success"]
+    try:
+        if failed:
+            raise SnapshotValidationError(f"{len(failed)} document(s) failed to ingest")
+        count = snapshots.validate(snapshot_path, store.collection_name, min_chunks=expected,
+                                   shards=settings.CHROMA_SHARDS)
+        if settings.QUANTIZED_INDEX and settings.CHROMA_SHARDS > 1:
+            logger.warning("QUANTIZED_INDEX is not supported with CHROMA_SHARDS > 1; skipping the quantized index")
+        elif settings.QUANTIZED_INDEX:
+            QuantizedIndex.build(store.collection, str(snapshot_path))
+    except (SnapshotValidationError, RuntimeError):
+        logger.exception("Snapshot %s rejected; the active index is unchanged", snapshot_path.name)
+        shutil.rmtree(snapshot_path, ignore_errors=True)
+        return 1
+    snapshots.activate(snapshot_path, store.collection_name, count)
+    snapshots.gc()
     return 0
 
 if __name__ == "__main__":
-    raise SystemExit(main(parallel=1))
+    args = parse_args()
+    raise SystemExit(main(parallel=args.parallel, profile=args.profile, in_place=args.in_place,
+                          doc_paths=args.paths, rebuild=args.rebuild))
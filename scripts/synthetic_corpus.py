@@ -0,0 +1,193 @@
+# project-rag-kaiser/scripts/synthetic_corpus.py
+"""
+Synthetic Kaiser-like corpus generator for benchmarks.
+
+Produces page-indexed text with chapters, section headers, policy prose and the
+repeated headers/footers/disclaimers found in real member guides, sized by the
+number of chunks it should yield at the configured CHUNK_SIZE. Pages are
+generated lazily and can be consumed in memory (for chunker/embedder
+benchmarks) or streamed to .txt/.pdf files (for loader benchmarks and
+end-to-end ingestion runs).
+
+    python ./scripts/synthetic_corpus.py --chunks 10000 --docs 4 --format pdf --out data/synthetic
+"""
+import argparse
+import math
+import random
+from array import array
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+# Approximate chunks produced per generated page at CHUNK_SIZE=800/CHUNK_OVERLAP=100
+PAGE_CHARS = 3000
+CHUNKS_PER_PAGE = 4
+
+REGIONS = ["Northern California", "Southern California", "Washington", "Colorado", "Georgia", "Hawaii"]
+SECTIONS = [
+    "Your Rights And Responsibilities", "Getting The Care You Need", "Benefits And Your Cost Share",
+    "Prescription Drug Coverage", "Emergency Services", "Filing A Claim", "Appeals And Grievances",
+    "Eligibility And Enrollment", "Preventive Care Services", "Behavioral Health Services",
+]
+SUBJECTS = ["Members", "Your Primary Care Physician", "The Health Plan", "A network provider",
+            "Medical Group", "Your care team", "The plan administrator", "Each enrollee"]
+VERBS = ["must obtain", "may request", "will receive", "is responsible for", "can appeal",
+         "should review", "is entitled to", "may be charged for"]
+OBJECTS = ["prior authorization for specialty care", "a copayment for each office visit",
+           "coverage for emergency services", "the Evidence of Coverage document",
+           "preventive screenings at no cost", "a written notice of the decision",
+           "an independent medical review", "prescription drugs on the formulary",
+           "urgent care outside the service area", "durable medical equipment"]
+QUALIFIERS = ["within 30 days", "unless otherwise stated", "as described in this chapter",
+              "subject to the deductible", "when medically necessary", "in accordance with state law",
+              "during the open enrollment period", "after the annual out-of-pocket maximum is met"]
+
+BOILERPLATE_HEADER = "Kaiser Foundation Health Plan, Inc. - Member Guide {year} - {region}"
+BOILERPLATE_FOOTER = (
+    "This document is a summary. Please refer to your Evidence of Coverage for full terms. "
+    "Questions? Call Member Services 1-800-464-4000 (TTY 711), 24 hours a day, 7 days a week. Page {page}"
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}."
+
+
+def generate_pages(num_chunks: int, pages_per_chapter: int = 12, seed: int = 0,
+                   region: str = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_num, text) pages that chunk into roughly ``num_chunks`` chunks."""
+    rng = random.Random(seed)
+    region = region or rng.choice(REGIONS)
+    num_pages = max(1, math.ceil(num_chunks / CHUNKS_PER_PAGE))
+    header = BOILERPLATE_HEADER.format(year=2024 + seed % 3, region=region)
+
+    for page in range(1, num_pages + 1):
+        lines = [header]
+        if (page - 1) % pages_per_chapter == 0:
+            chapter = (page - 1) // pages_per_chapter + 1
+            lines.append(f"Chapter {chapter}")
+            lines.append(SECTIONS[(chapter - 1) % len(SECTIONS)].upper())
+        body_chars = 0
+        paragraph = []
+        while body_chars < PAGE_CHARS:
+            if rng.random() < 0.08:
+                lines.append(" ".join(paragraph))
+                paragraph = []
+                lines.append("")
+                lines.append(rng.choice(SECTIONS))
+            sentence = _sentence(rng)
+            paragraph.append(sentence)
+            body_chars += len(sentence) + 1
+            if len(paragraph) >= 6:
+                lines.append(" ".join(paragraph))
+                lines.append("")
+                paragraph = []
+        if paragraph:
+            lines.append(" ".join(paragraph))
+        lines.append(BOILERPLATE_FOOTER.format(page=page))
+        yield page, "\n".join(lines)
+
+
+def generate_corpus(num_chunks: int, docs: int = 1,
+                    seed: int = 0) -> Iterator[Tuple[str, Iterator[Tuple[int, str]]]]:
+    """
+    Yield (source_file, pages) splitting ``num_chunks`` across ``docs`` documents.
+    ``pages`` is a lazy page iterator, so a 2M-chunk corpus is never held in memory.
+    """
+    per_doc = max(1, num_chunks // docs)
+    for i in range(docs):
+        region = REGIONS[i % len(REGIONS)]
+        name = f"synthetic-member-guide-{region.lower().replace(' ', '-')}-{i + 1}.pdf"
+        yield name, generate_pages(per_doc, seed=seed + i, region=region)
+
+
+def write_text(path: Path, pages) -> Path:
+    """Write pages to a text file separated by form feeds."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        for i, (_, text) in enumerate(pages):
+            if i:
+                fh.write("\f")
+            fh.write(text)
+    return path
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    out = []
+    for line in text.split("\n"):
+        while len(line) > width:
+            cut = line.rfind(" ", 0, width)
+            cut = cut if cut > 0 else width
+            out.append(line[:cut])
+            line = line[cut:].lstrip()
+        out.append(line)
+    return out
+
+
+def write_pdf(path: Path, pages) -> Path:
+    """
+    Write pages to a minimal text-only PDF (Helvetica, one PDF page per page).
+
+    Pages are streamed: each page is written as soon as it is generated and only
+    the xref offsets are kept, so the page tree (which lists every page) is
+    written last.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Object ids: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    offsets = {}
+    page_ids = array("l")
+    with path.open("wb") as fh:
+        def write_object(oid: int, body: bytes) -> None:
+            offsets[oid] = fh.tell()
+            fh.write(b"%d 0 obj\n" % oid + body + b"\nendobj\n")
+
+        fh.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for _, text in pages:
+            pid = 4 + 2 * len(page_ids)
+            page_ids.append(pid)
+            ops = ["BT", "/F1 8 Tf", "10 TL", "36 806 Td"]
+            for line in _wrap(text)[:78]:
+                ops.append(f"({_pdf_escape(line)}) Tj T*")
+            ops.append("ET")
+            stream = "\n".join(ops).encode("latin-1", errors="replace")
+            write_object(pid, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                               f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>").encode("latin-1"))
+            write_object(pid + 1, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1"))
+
+        xref = fh.tell()
+        count = max(offsets) + 1
+        fh.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for oid in range(1, count):
+            fh.write(b"%010d 00000 n \n" % offsets[oid])
+        fh.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+    return path
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--chunks", type=int, default=10000, help="Approximate total chunks the corpus should yield")
+    p.add_argument("--docs", type=int, default=1, help="Number of documents to split the corpus into")
+    p.add_argument("--format", choices=["pdf", "txt"], default="pdf")
+    p.add_argument("--out", type=Path, default=Path("data/synthetic"))
+    p.add_argument("--seed", type=int, default=0)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    for name, pages in generate_corpus(args.chunks, docs=args.docs, seed=args.seed):
+        target = args.out / (name if args.format == "pdf" else name.replace(".pdf", ".txt"))
+        (write_pdf if args.format == "pdf" else write_text)(target, pages)
+        print(f"Wrote {target} ({target.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
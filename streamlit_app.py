@@ -3,6 +3,7 @@ import os
 import shutil
 from rag.query_pipeline import RAGPipeline
 from app.ingestion.embedder import Embedder
+from app.ingestion.snapshots import SnapshotManager
 
 # Page config
 st.set_page_config(
@@ -31,8 +32,17 @@ except Exception as e:
 # Sidebar for Admin/Debug
 with st.sidebar:
     st.header("Admin Controls")
-    
-    if st.button("Clear Vector Database", type="secondary"):
+
+    snapshots = SnapshotManager()
+    current_snapshot = snapshots.current()
+    if current_snapshot:
+        # Blue/green index: rebuild with scripts/run_ingestion.py; the live
+        # retriever switches to the new snapshot without a restart.
+        st.caption(f"Index snapshot: {current_snapshot['version']} ({current_snapshot.get('chunks', '?')} chunks)")
+        if st.button("Remove Old Snapshots", type="secondary"):
+            removed = snapshots.gc()
+            st.info(f"Removed {len(removed)} old snapshot(s).")
+    elif st.button("Clear Vector Database", type="secondary"):
         persist_dir = os.getenv("CHROMA_PERSIST_DIR", "data/embeddings/chroma")
         if os.path.exists(persist_dir):
             try: